@@ -0,0 +1,22 @@
+"""Benchmarks of the attribution of legacy strings."""
+
+from fluent.migrate.blame import Blame
+from fluent.migrate.changesets import convert_blame_to_changesets
+from fluent.migrate.repo_client import RepoClient
+
+
+def test_attribution(benchmark, synthetic):
+    client = RepoClient(synthetic.localization_dir)
+    result = benchmark(
+        lambda: Blame(client).attribution(synthetic.legacy_paths)
+    )
+    assert len(result["authors"]) == min(
+        synthetic.config.authors, synthetic.config.commits
+    )
+
+
+def test_convert_blame_to_changesets(benchmark, synthetic):
+    client = RepoClient(synthetic.localization_dir)
+    result = Blame(client).attribution(synthetic.legacy_paths)
+    changesets = benchmark(convert_blame_to_changesets, result)
+    assert len(changesets) == len(result["authors"])
@@ -0,0 +1,64 @@
+"""Benchmarks of the MigrationContext API."""
+
+import logging
+
+import pytest
+
+# Missing messages are expected, don't measure logging.
+logging.disable(logging.WARNING)
+
+
+@pytest.fixture(scope="module")
+def recipe(synthetic):
+    return synthetic.load_recipe()
+
+
+def migrated_context(synthetic, recipe):
+    """A context with the transforms of `recipe` and all of its files read."""
+    ctx = synthetic.context()
+    recipe.migrate(ctx)
+    ctx.prefetch()
+    return (ctx,), {}
+
+
+def test_add_transforms(benchmark, synthetic, recipe):
+    # Files are only read by `prefetch`, time it together with the recipe.
+    def add_transforms():
+        ctx = synthetic.context()
+        recipe.migrate(ctx)
+        ctx.prefetch()
+        return ctx
+
+    ctx = benchmark(add_transforms)
+    assert len(ctx.localization_resources) == synthetic.config.files
+
+
+@pytest.mark.parametrize("in_memory", [False, True], ids=["files", "memory"])
+def test_prefetch(benchmark, synthetic, recipe, in_memory):
+    def migrated(ctx):
+        recipe.migrate(ctx)
+        return (ctx,), {}
+
+    benchmark.pedantic(
+        lambda ctx: ctx.prefetch(),
+        setup=lambda: migrated(synthetic.context(in_memory)),
+        rounds=5,
+    )
+
+
+def test_merge_changeset(benchmark, synthetic, recipe):
+    merged = benchmark.pedantic(
+        lambda ctx: list(ctx.merge_changeset()),
+        setup=lambda: migrated_context(synthetic, recipe),
+        rounds=5,
+    )
+    assert len(merged) == synthetic.config.files
+
+
+def test_serialize_changeset(benchmark, synthetic, recipe):
+    serialized = benchmark.pedantic(
+        lambda ctx: ctx.serialize_changeset(None),
+        setup=lambda: migrated_context(synthetic, recipe),
+        rounds=5,
+    )
+    assert len(serialized) == synthetic.config.files
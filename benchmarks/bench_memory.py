@@ -0,0 +1,53 @@
+"""Memory use of the transforms of a recipe."""
+
+import tracemalloc
+
+from fluent.migrate.helpers import cached_transforms
+from fluent.migrate.transforms import Transform
+from fluent.migrate.util import fold
+
+
+class TransformsContext:
+    """Keeps the transforms of a recipe, without their dependencies."""
+
+    def __init__(self, locale):
+        self.locale = locale
+        self.transforms = []
+
+    def add_transforms(self, target, reference, transforms):
+        self.transforms.extend(transforms)
+
+
+def count_transforms(transforms):
+    def count(acc, node):
+        return acc + 1 if isinstance(node, Transform) else acc
+
+    return sum(fold(count, node, 0) for node in transforms)
+
+
+def test_transforms_memory(benchmark, synthetic):
+    recipe = synthetic.load_recipe()
+
+    def setup():
+        # Each round parses the snippets of transforms_from again.
+        cached_transforms.cache_clear()
+
+    def record():
+        ctx = TransformsContext(synthetic.config.locale)
+        tracemalloc.start()
+        try:
+            recipe.migrate(ctx)
+            # Only the trees handed out to the context are left.
+            cached_transforms.cache_clear()
+            size, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return ctx, size, peak
+
+    ctx, size, peak = benchmark.pedantic(record, setup=setup, rounds=3)
+    transforms = count_transforms(ctx.transforms)
+    benchmark.extra_info["transforms"] = transforms
+    benchmark.extra_info["bytes"] = size
+    benchmark.extra_info["peak_bytes"] = peak
+    benchmark.extra_info["bytes_per_transform"] = size / transforms
+    assert transforms > 0
@@ -0,0 +1,43 @@
+"""Benchmarks of complete migrations against a local git repository."""
+
+import contextlib
+import io
+import shutil
+import tempfile
+from os.path import join
+
+from fluent.migrate.repo_client import git
+from fluent.migrate.tool import Migrator
+
+
+def test_run(benchmark, synthetic):
+    recipe = synthetic.load_recipe()
+    roots = []
+
+    def setup():
+        # Each round commits to a fresh copy of the localization repository.
+        root = tempfile.mkdtemp()
+        roots.append(root)
+        localization_dir = join(root, "localization")
+        shutil.copytree(synthetic.localization_dir, localization_dir)
+        migrator = Migrator(
+            synthetic.config.locale,
+            synthetic.reference_dir,
+            localization_dir,
+            dry_run=False,
+        )
+        return (migrator,), {}
+
+    def run(migrator):
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrator.run(recipe)
+        migrator.close()
+        return migrator
+
+    try:
+        migrator = benchmark.pedantic(run, setup=setup, rounds=3)
+        log = git(migrator.localization_dir, "log", "--format=%s").splitlines()
+        assert len(log) > synthetic.config.commits
+    finally:
+        for root in roots:
+            shutil.rmtree(root)
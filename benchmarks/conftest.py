@@ -0,0 +1,29 @@
+import pytest
+
+from synthetic import SyntheticConfig, generate
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("synthetic", "synthetic localization repository")
+    for field, default in SyntheticConfig._field_defaults.items():
+        group.addoption(
+            f"--synthetic-{field}",
+            type=type(default),
+            default=default,
+            help=f"{field} of the synthetic repository (default: {default})",
+        )
+
+
+@pytest.fixture(scope="session")
+def synthetic_config(request):
+    return SyntheticConfig(
+        **{
+            field: request.config.getoption(f"synthetic_{field}")
+            for field in SyntheticConfig._fields
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def synthetic(synthetic_config, tmp_path_factory):
+    return generate(str(tmp_path_factory.mktemp("synthetic")), synthetic_config)
@@ -0,0 +1,193 @@
+"""Synthetic localization repositories for benchmarks.
+
+`generate` creates a reference directory with en-US FTL files, a git
+localization repository with legacy DTD and properties files written by
+several authors over many commits, and a migration recipe moving all of
+the legacy strings to Fluent.
+"""
+
+from __future__ import annotations
+from types import ModuleType
+from typing import List, NamedTuple
+
+from datetime import datetime
+import importlib.util
+import os
+from os.path import join
+
+from fluent.migrate.context import MigrationContext
+from fluent.migrate.repo_client import git
+from fluent.migrate.storage import MemoryStorage
+
+
+class SyntheticConfig(NamedTuple):
+    # Number of legacy files, alternating between DTD and properties.
+    files: int = 10
+    # Number of simple strings in each legacy file.
+    keys: int = 100
+    # Number of plural strings in each properties file.
+    plurals: int = 10
+    # Number of distinct commit authors.
+    authors: int = 10
+    # Number of commits adding the strings to the localization.
+    commits: int = 20
+    locale: str = "pl"
+
+
+class SyntheticRepository(NamedTuple):
+    config: SyntheticConfig
+    reference_dir: str
+    localization_dir: str
+    recipe_path: str
+    legacy_paths: List[str]
+
+    def load_recipe(self) -> ModuleType:
+        spec = importlib.util.spec_from_file_location(
+            "synthetic_recipe", self.recipe_path
+        )
+        recipe = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(recipe)
+        return recipe
+
+    def context(self, in_memory: bool = False) -> MigrationContext:
+        """A context for the repository, reading its files from memory if
+        `in_memory` is set."""
+        if not in_memory:
+            return MigrationContext(
+                self.config.locale, self.reference_dir, self.localization_dir
+            )
+        return MigrationContext(
+            self.config.locale,
+            self.reference_dir,
+            self.localization_dir,
+            reference_storage=memory_storage(self.reference_dir),
+            localization_storage=memory_storage(self.localization_dir),
+        )
+
+
+def memory_storage(root: str) -> MemoryStorage:
+    """Read the files below `root` into memory, except for the git directory."""
+    files = {}
+    for dir, dirs, names in os.walk(root):
+        if ".git" in dirs:
+            dirs.remove(".git")
+        for name in names:
+            path = join(dir, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return MemoryStorage(files)
+
+
+def legacy_path(index: int) -> str:
+    ext = "dtd" if index % 2 == 0 else "properties"
+    return f"browser/file{index}.{ext}"
+
+
+def ftl_path(index: int) -> str:
+    return f"browser/file{index}.ftl"
+
+
+def legacy_entry(path: str, key: str, value: str) -> str:
+    if path.endswith(".dtd"):
+        return f'<!ENTITY {key} "{value}">\n'
+    return f"{key} = {value}\n"
+
+
+def generate(root: str, config: SyntheticConfig = SyntheticConfig()):
+    """Create a synthetic repository in the empty directory `root`."""
+    reference_dir = join(root, "reference")
+    localization_dir = join(root, "localization")
+    os.makedirs(join(reference_dir, "browser"))
+    os.makedirs(join(localization_dir, "browser"))
+
+    legacy_paths = [legacy_path(index) for index in range(config.files)]
+    # Legacy entries of each file, keyed by the commit adding them.
+    commits: List[List[List[str]]] = [
+        [[] for _ in range(config.commits)] for _ in legacy_paths
+    ]
+    recipe = [
+        "import fluent.syntax.ast as FTL",
+        "from fluent.migrate import PLURALS",
+        "from fluent.migrate.helpers import VARIABLE_REFERENCE, transforms_from",
+        "",
+        "",
+        "def migrate(ctx):",
+        '    """Synthetic migration, part {index}."""',
+    ]
+    counter = 0
+    for index, path in enumerate(legacy_paths):
+        reference = []
+        copies = []
+        for key_index in range(config.keys):
+            key = f"string{key_index}"
+            value = f"Translated string {key_index} of file {index}"
+            commits[index][counter % config.commits].append(
+                legacy_entry(path, key, value)
+            )
+            counter += 1
+            reference.append(f"string-{key_index} = String {key_index}\n")
+            copies.append(f'string-{key_index} = {{ COPY(path, "{key}") }}')
+        plurals = []
+        if path.endswith(".properties"):
+            for key_index in range(config.plurals):
+                key = f"plural{key_index}"
+                value = f"One file {key_index};#1 files {key_index}"
+                commits[index][counter % config.commits].append(
+                    legacy_entry(path, key, value)
+                )
+                counter += 1
+                reference.append(
+                    f"plural-{key_index} = {{ $num ->\n"
+                    f"    [one] One file\n"
+                    f"   *[other] {{ $num }} files\n"
+                    "}\n"
+                )
+                plurals.append(
+                    f"FTL.Message(FTL.Identifier('plural-{key_index}'), "
+                    f"value=PLURALS({path!r}, {key!r}, VARIABLE_REFERENCE('num')))"
+                )
+        with open(join(reference_dir, ftl_path(index)), "w") as f:
+            f.writelines(reference)
+        recipe += [
+            "    ctx.add_transforms(",
+            f"        {ftl_path(index)!r},",
+            f"        {ftl_path(index)!r},",
+            "        transforms_from(",
+            '            """',
+            *copies,
+            '""",',
+            f"            path={path!r},",
+            "        )",
+            "        + [",
+            *(f"            {plural}," for plural in plurals),
+            "        ],",
+            "    )",
+        ]
+
+    recipe_path = join(root, "synthetic_recipe.py")
+    with open(recipe_path, "w") as f:
+        f.write("\n".join(recipe) + "\n")
+
+    git(localization_dir, "init")
+    git(localization_dir, "config", "user.name", "Synthetic")
+    git(localization_dir, "config", "user.email", "synthetic@example.com")
+    contents = ["" for _ in legacy_paths]
+    for commit in range(config.commits):
+        for index, path in enumerate(legacy_paths):
+            contents[index] += "".join(commits[index][commit])
+            with open(join(localization_dir, path), "w") as f:
+                f.write(contents[index])
+        author = commit % config.authors
+        git(localization_dir, "add", ".")
+        git(
+            localization_dir,
+            "commit",
+            "--allow-empty",
+            f"--date={datetime.fromtimestamp(1272837600 + commit * 86400)}",
+            f"--author=Author {author} <author{author}@example.com>",
+            f"--message=Commit {commit}",
+        )
+
+    return SyntheticRepository(
+        config, reference_dir, localization_dir, recipe_path, legacy_paths
+    )
@@ -1,13 +1,11 @@
 from __future__ import annotations
-from typing import Dict, Optional, Set, Tuple, cast
+from typing import Dict, Iterable, List, Optional, Set, Tuple, cast
 
-import os
-import codecs
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import logging
 from itertools import zip_longest
 
-from compare_locales.parser import getParser
 from compare_locales.plurals import get_plural
 import fluent.syntax.ast as FTL
 from fluent.syntax.parser import FluentParser
@@ -17,7 +15,20 @@ from .changesets import Changes
 from .errors import UnreadableReferenceError
 from .evaluator import Evaluator
 from .merge import merge_resource
+from .resources import (
+    FluentSourceResource,
+    LegacyResource,
+    ResourceRegistry,
+    ScannedResource,
+    report_junk,
+    splice_resource,
+)
+from .intern import SourceMask, SourceTable
+from .shared import SharedReferences
+from .stats import Stats
+from .storage import Storage
 from .transforms import Source
+from .util import get_message
 
 
 class InternalContext:
@@ -27,11 +38,24 @@ class InternalContext:
     """
 
     dependencies: Dict[Tuple[str, str], Set[Tuple[str, Source]]] = {}
+    dependency_masks: Dict[Tuple[str, str], SourceMask] = {}
     localization_dir: str
+    localization_registry: ResourceRegistry
+    localization_storage: Storage
     reference_dir: str
+    reference_storage: Optional[Storage]
 
-    def __init__(self, lang, enforce_translated=False):
+    def __init__(
+        self,
+        lang,
+        enforce_translated=False,
+        preserve_formatting=False,
+        stats: Optional[Stats] = None,
+        shared_references: Optional[SharedReferences] = None,
+    ):
         self.fluent_parser = FluentParser(with_spans=False)
+        # Localized sources are parsed with spans, for `Blame`.
+        self.fluent_span_parser = FluentParser(with_spans=True)
         self.fluent_serializer = FluentSerializer()
 
         # An iterable of plural category names relevant to the context's
@@ -45,68 +69,79 @@ class InternalContext:
             self.plural_categories = ("one", "other")
 
         self.enforce_translated = enforce_translated
+        # Keep the original text of existing localization files and only
+        # splice new entries into them when serializing.
+        self.preserve_formatting = preserve_formatting
         # Parsed input resources stored by resource path.
         self.reference_resources = {}
-        self.localization_resources = {}
         self.target_resources = {}
+        # Reads deferred to `prefetch`: the reference path and the new
+        # transforms of each target, and the existing targets to read.
+        self.pending_references: Dict[str, Tuple[str, List[FTL.Entry]]] = {}
+        self.pending_targets: Set[str] = set()
+        # The last serialized state of existing localization files, used to
+        # preserve their formatting.
+        self.target_sources = {}
 
         # An iterable of `FTL.Message` objects some of whose nodes can be the
         # transform operations.
         self.transforms = {}
 
+        # Numbers the legacy sources of transforms.
+        self.sources = SourceTable()
+
+        # Phase timers and counters for instrumentation.
+        self.stats = stats if stats is not None else Stats()
+        # Reference resources parsed by another process, if any.
+        self.shared_references = shared_references
+
         # The evaluator instance is an AST transformer capable of walking an
         # AST hierarchy and evaluating nodes which are migration Transforms.
         self.evaluator = Evaluator(self)
 
-    def read_ftl_resource(self, path: str):
-        """Read an FTL resource and parse it into an AST."""
-        f = codecs.open(path, "r", "utf8")
+    def read_ftl_source(self, storage: Storage, path: str) -> str:
+        """Read the source of an FTL resource."""
+        data = storage.read(path)
+        self.stats.count("files_read")
         try:
-            contents = f.read()
+            return data.decode("utf-8")
         except UnicodeDecodeError as err:
             logger = logging.getLogger("migrate")
-            logger.warning(f"Unable to read file {path}: {err}")
+            logger.warning(f"Unable to read file {storage.location(path)}: {err}")
             raise err
-        finally:
-            f.close()
 
+    def read_ftl_resource(self, storage: Storage, path: str):
+        """Read an FTL resource and parse it into an AST."""
+        contents = self.read_ftl_source(storage, path)
         ast = self.fluent_parser.parse(contents)
-
-        annots = [
-            annot
-            for entry in ast.body
-            if isinstance(entry, FTL.Junk)
-            for annot in entry.annotations
-        ]
-
-        if len(annots):
-            logger = logging.getLogger("migrate")
-            for annot in annots:
-                msg = annot.message
-                logger.warning(f"Syntax error in {path}: {msg}")
-
+        report_junk(storage.location(path), ast)
         return ast
 
     def read_legacy_resource(self, path: str):
-        """Read a legacy resource and parse it into a dict."""
-        parser = getParser(path)
-        parser.readFile(path)
-        # Transform the parsed result which is an iterator into a dict.
-        return {
-            entity.key: entity.val
-            for entity in parser
-            if entity.localized or self.enforce_translated
-        }
-
-    def read_reference_ftl(self, path: str):
+        """Read a legacy localization resource and index it by key.
+
+        Values are only unescaped when they're requested by
+        `get_legacy_source`.
+        """
+        data = self.localization_storage.read(path)
+        self.stats.count("files_read")
+        return LegacyResource.from_bytes(path, data, self.enforce_translated)
+
+    def read_reference_ftl(self, path: str, idents: Optional[Set[str]] = None):
         """Read and parse a reference FTL file.
 
         A missing resource file is a fatal error and will raise an
         UnreadableReferenceError.
+
+        If the file is in `shared_references`, only the Messages and Terms
+        in `idents` are parsed from it.
         """
-        fullpath = os.path.join(self.reference_dir, path)
+        if self.shared_references is not None and path in self.shared_references:
+            return self.shared_references.resource(path, idents)
+        storage = cast(Storage, self.reference_storage)
+        fullpath = storage.location(path)
         try:
-            return self.read_ftl_resource(fullpath)
+            return self.read_ftl_resource(storage, path)
         except OSError:
             error_message = f"Missing reference file: {fullpath}"
             logging.getLogger("migrate").error(error_message)
@@ -116,15 +151,27 @@ class InternalContext:
             logging.getLogger("migrate").error(error_message)
             raise UnreadableReferenceError(error_message)
 
+    def check_reference(self, path: str):
+        """Raise an UnreadableReferenceError if the reference is missing."""
+        if self.shared_references is not None and path in self.shared_references:
+            return
+        storage = cast(Storage, self.reference_storage)
+        if not storage.exists(path):
+            error_message = f"Missing reference file: {storage.location(path)}"
+            logging.getLogger("migrate").error(error_message)
+            raise UnreadableReferenceError(error_message)
+
     def read_localization_ftl(self, path: str):
-        """Read and parse an existing localization FTL file.
+        """Read and scan an existing localization FTL file.
 
-        Create a new FTL.Resource if the file doesn't exist or can't be
-        decoded.
+        The returned `ScannedResource` is only parsed once a merge needs its
+        content. Create a new FTL.Resource if the file doesn't exist or can't
+        be decoded.
         """
-        fullpath = os.path.join(self.localization_dir, path)
+        storage = self.localization_storage
         try:
-            return self.read_ftl_resource(fullpath)
+            contents = self.read_ftl_source(storage, path)
+            return ScannedResource(storage.location(path), contents, self.fluent_parser)
         except OSError:
             logger = logging.getLogger("migrate")
             logger.info(
@@ -141,24 +188,93 @@ class InternalContext:
             )
             return FTL.Resource()
 
-    def maybe_add_localization(self, path: str):
+    @property
+    def localization_resources(
+        self,
+    ) -> Dict[str, LegacyResource | FluentSourceResource | FTL.Resource]:
+        """Localization resources to migrate translations from, by path.
+
+        Resources added since the last access are read first.
+        """
+        return self.localization_registry.load()
+
+    def maybe_add_localization(self, path: str) -> bool:
         """Add a localization resource to migrate translations from.
 
+        The resource is only read once `localization_resources` are used.
+        Return False if it's missing.
+        """
+        return self.localization_registry.add(path)
+
+    def read_localization_resource(self, path: str):
+        """Read a localization resource to migrate translations from.
+
         Uses a compare-locales parser to create a dict of (key, string value)
         tuples.
         For Fluent sources, we store the AST.
         """
-        try:
-            fullpath = os.path.join(self.localization_dir, path)
-            if not fullpath.endswith(".ftl"):
-                collection = self.read_legacy_resource(fullpath)
-            else:
-                collection = self.read_ftl_resource(fullpath)
-        except OSError:
-            logger = logging.getLogger("migrate")
-            logger.warning(f"Missing localization file: {path}")
-        else:
-            self.localization_resources[path] = collection
+        if not path.endswith(".ftl"):
+            return self.read_legacy_resource(path)
+        return self.read_fluent_source(path)
+
+    def read_fluent_source(self, path: str) -> FluentSourceResource:
+        """Read a localized FTL resource, keeping the lines of its values."""
+        storage = self.localization_storage
+        contents = self.read_ftl_source(storage, path)
+        ast = self.fluent_span_parser.parse(contents)
+        report_junk(storage.location(path), ast)
+        return FluentSourceResource(contents, ast)
+
+    def prefetch(self, jobs: Optional[int] = None):
+        """Read the files of the transforms added since the last prefetch.
+
+        The reference, legacy and existing target files are read and parsed
+        in a pool of `jobs` threads. Missing legacy files are reported
+        together, and so are unreadable references, in a single
+        UnreadableReferenceError.
+        """
+        references, self.pending_references = self.pending_references, {}
+        targets, self.pending_targets = sorted(self.pending_targets), set()
+        registry = self.localization_registry
+        if not (references or targets or registry.pending):
+            return
+
+        errors = []
+        with ThreadPoolExecutor(jobs) as executor:
+            reference_futures = {
+                target: executor.submit(
+                    self.read_reference_ftl,
+                    reference,
+                    {node.id.name for node in self.transforms[target]},
+                )
+                for target, (reference, _) in references.items()
+            }
+            target_asts = executor.map(self.read_localization_ftl, targets)
+            registry.load(executor.map)
+            for target, target_ast in zip(targets, target_asts):
+                self.target_resources[target] = target_ast
+                if isinstance(target_ast, ScannedResource):
+                    self.target_sources[target] = target_ast
+            for target, future in reference_futures.items():
+                try:
+                    self.reference_resources[target] = future.result()
+                except UnreadableReferenceError as err:
+                    errors.append(str(err))
+        if errors:
+            raise UnreadableReferenceError("\n".join(errors))
+
+        # The target Fluent messages should exist in the reference file. If
+        # they don't, it's probably a typo.
+        for target, (reference, transforms) in references.items():
+            reference_ast = self.reference_resources[target]
+            for node in transforms:
+                if get_message(reference_ast.body, node.id.name) is None:
+                    logger = logging.getLogger("migrate")
+                    logger.warning(
+                        '{} "{}" was not found in {}'.format(
+                            type(node).__name__, node.id.name, reference
+                        )
+                    )
 
     def get_legacy_source(self, path: str, key: str):
         """Get an entity value from a localized legacy source.
@@ -197,7 +313,21 @@ class InternalContext:
         Uses FTL.BaseNode.equals to compare all messages/terms
         in two FTL resources.
         If the order or number of messages differ, the result is also False.
+
+        `res1` may be a `ScannedResource`, which `res2` was merged from. Its
+        Messages and Terms are equal to those of `res2` if they're the same
+        parsed entries.
         """
+        if isinstance(res1, ScannedResource):
+            entries = [
+                entry
+                for entry in res2.body
+                if isinstance(entry, FTL.Message) or isinstance(entry, FTL.Term)
+            ]
+            ids = sorted(entry.id.name for entry in entries)
+            return ids == sorted(res1.ids) and all(
+                entry is res1.get_entry(entry.id.name) for entry in entries
+            )
 
         def message_id(message):
             "Return the message's identifer name for sorting purposes."
@@ -230,6 +360,7 @@ class InternalContext:
         self,
         changeset: Optional[Changes] = None,
         known_translations: Optional[Changes] = None,
+        paths: Optional[Iterable[str]] = None,
     ):
         """Return a generator of FTL ASTs for the changeset.
 
@@ -245,8 +376,12 @@ class InternalContext:
         Given `changeset`, return a dict whose keys are resource paths and
         values are `FTL.Resource` instances.  The values will also be used to
         update this context's existing localization resources.
+
+        If `paths` is given, only the resources at these paths are merged.
         """
 
+        self.prefetch()
+
         if changeset is None:
             # Merge all known legacy translations. Used in tests.
             changeset = {
@@ -256,16 +391,30 @@ class InternalContext:
                 for key in strings.keys()
             }
 
+        changeset_mask = self.sources.mask(changeset)
         if known_translations is None:
-            known_translations = changeset
+            known_mask = changeset_mask
+        else:
+            known_mask = self.sources.mask(known_translations)
 
-        for path, reference in self.reference_resources.items():
+        if paths is None:
+            paths = self.reference_resources.keys()
+
+        for path in paths:
+            reference = self.reference_resources[path]
             current = self.target_resources[path]
             transforms = self.transforms.get(path, [])
             in_changeset = partial(
-                self.in_changeset, changeset, known_translations, path
+                self.in_changeset_mask, changeset_mask, known_mask, path
             )
 
+            if isinstance(current, ScannedResource):
+                # Skip merging existing localization files which this merge
+                # wouldn't change. Otherwise, the merge only parses the
+                # entries it looks up.
+                if current.merges_unchanged(reference, transforms, in_changeset):
+                    continue
+
             # Merge legacy translations with the existing ones using the
             # reference as a template.
             snapshot = merge_resource(
@@ -308,7 +457,26 @@ class InternalContext:
         constructed from two legacy strings out of which only one is
         avaiable) will never be migrated.
         """
-        message_deps = self.dependencies.get((path, ident), None)
+        return self.in_changeset_mask(
+            self.sources.mask(changeset),
+            self.sources.mask(known_translations),
+            path,
+            ident,
+        )
+
+    def in_changeset_mask(
+        self,
+        changeset: SourceMask,
+        known_translations: SourceMask,
+        path: str,
+        ident,
+    ) -> bool:
+        """Check if a message should be migrated in this changeset.
+
+        Like `in_changeset`, with the sources given by their bitmasks in
+        `self.sources`.
+        """
+        message_deps = self.dependency_masks.get((path, ident), None)
 
         # Don't merge if we don't have a transform for this message.
         if message_deps is None:
@@ -318,7 +486,7 @@ class InternalContext:
         # dependecies, it's a hardcoded `FTL.Node` which doesn't
         # migrate any existing translation but rather creates a new
         # one.  Merge it.
-        if len(message_deps) == 0:
+        if message_deps == 0:
             return True
 
         # Make sure all the dependencies are present in the current
@@ -326,25 +494,58 @@ class InternalContext:
         # See https://bugzilla.mozilla.org/show_bug.cgi?id=1321271
         # We only return True if our current changeset touches
         # the transform, and we have all of the dependencies.
-        active_deps = cast(bool, message_deps & changeset)
+        active_deps = message_deps & changeset
         available_deps = message_deps & known_translations
-        return active_deps and message_deps == available_deps
+        return active_deps != 0 and message_deps == available_deps
 
     def serialize_changeset(
-        self, changeset: Changes, known_translations: Optional[Changes] = None
+        self,
+        changeset: Changes,
+        known_translations: Optional[Changes] = None,
+        paths: Optional[Iterable[str]] = None,
     ):
         """Return a dict of serialized FTLs for the changeset.
 
         Given `changeset`, return a dict whose keys are resource paths and
         values are serialized FTL snapshots.
+
+        With `preserve_formatting`, new entries are spliced into the text of
+        existing localization files, and paths whose text wouldn't change are
+        left out.
         """
 
-        return {
-            path: self.fluent_serializer.serialize(snapshot)
-            for path, snapshot in self.merge_changeset(changeset, known_translations)
-        }
+        self.prefetch()
+        previous = dict(self.target_resources)
+        with self.stats.phase("merge"):
+            merged = list(self.merge_changeset(changeset, known_translations, paths))
+
+        with self.stats.phase("serialize"):
+            if not self.preserve_formatting:
+                return {
+                    path: self.fluent_serializer.serialize(snapshot)
+                    for path, snapshot in merged
+                }
+
+            serialized = {}
+            for path, snapshot in merged:
+                source = self.target_sources.get(path)
+                if source is None:
+                    serialized[path] = self.fluent_serializer.serialize(snapshot)
+                    continue
+                content = splice_resource(
+                    source, snapshot, previous[path], self.fluent_serializer
+                )
+                if content == source.source:
+                    continue
+                self.target_sources[path] = ScannedResource(
+                    source.path, content, self.fluent_parser
+                )
+                serialized[path] = content
+            return serialized
 
     def evaluate(self, node):
+        if isinstance(node, (FTL.Message, FTL.Term)):
+            self.stats.count("messages_evaluated")
         return self.evaluator.visit(node)
 
 
@@ -1,46 +1,381 @@
 from __future__ import annotations
-from typing import Dict, Iterable, Tuple, TypedDict, cast
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+    cast,
+)
 
+from array import array
 import argparse
 import json
+import os
 from os.path import join
 
 from compare_locales.parser import Junk, getParser
 from compare_locales.parser.fluent import FluentEntity
 
-from .repo_client import RepoClient
+from .intern import SourceTable
+from .repo_client import FileBlame, Hunk, RepoClient
+from .resources import LineSpans, decode_contents
 
 BlameData = Dict[str, Dict[str, Tuple[int, float]]]
 "File path -> message key -> [userid, timestamp]"
 
+# Blame whole files rather than passing more line ranges to git.
+MAX_LINE_RANGES = 100
+
+
+def line_ranges(line_spans: Iterable[Tuple[Any, int, int]]) -> List[Tuple[int, int]]:
+    """Merge the lines of `line_spans` into sorted ranges which don't touch."""
+    ranges: List[Tuple[int, int]] = []
+    for _, first, last in sorted(line_spans, key=lambda span: span[1]):
+        if ranges and first <= ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], last))
+        else:
+            ranges.append((first, last))
+    return ranges
+
+
+def apply_hunks(
+    lines: List[Tuple[str, int]], hunks: Iterable[Hunk]
+) -> List[Optional[Tuple[str, int]]]:
+    """Apply the hunks of a diff to the blame of the old lines of a file.
+
+    The added lines are None.
+    """
+    updated: List[Optional[Tuple[str, int]]] = []
+    old_index = 0
+    for old_start, old_count, _, new_count in hunks:
+        # A hunk without old lines inserts after its old start line.
+        start = old_start - 1 if old_count else old_start
+        updated += lines[old_index:start]
+        updated += [None] * new_count
+        old_index = start + old_count
+    updated += lines[old_index:]
+    return updated
+
+
+class BlameCache:
+    """The blame of files at a revision, stored in a JSON file.
+
+    When a file changed since it was blamed, the diff from the stored
+    revision is applied to its stored blame, and only the changed lines are
+    blamed again.
+
+    Only the blame of the last commit is stored. Changes in the working
+    directory are blamed on top of it, as they may be reverted or committed
+    before the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+            authors = data["authors"]
+            self.files = {
+                file: {
+                    "revision": stored["revision"],
+                    "lines": [(authors[user], time) for user, time in stored["lines"]],
+                }
+                for file, stored in data["files"].items()
+            }
+        except (OSError, ValueError, LookupError, TypeError):
+            # Start over from a missing or broken cache.
+            self.files = {}
+
+    def blame(self, client: RepoClient, file: str) -> List[Tuple[str, int]]:
+        """The blame of all lines of `file`, updating the stored blame."""
+        revision = client.head()
+        stored = self.files.get(file)
+        lines = None
+        if stored is not None:
+            try:
+                hunks = (
+                    []
+                    if stored["revision"] == revision
+                    else client.diff_hunks(stored["revision"], file, revision)
+                )
+            except Exception:
+                # The revision isn't known anymore.
+                pass
+            else:
+                lines = self.update(client, file, stored["lines"], hunks, revision)
+        if lines is None:
+            lines = cast(List[Tuple[str, int]], client.blame(file, revision=revision))
+        self.files[file] = {"revision": revision, "lines": lines}
+        working = self.update(client, file, lines, client.diff_hunks(revision, file))
+        if working is None:
+            working = cast(List[Tuple[str, int]], client.blame(file))
+        return working
+
+    def update(
+        self,
+        client: RepoClient,
+        file: str,
+        lines: List[Tuple[str, int]],
+        hunks: List[Hunk],
+        revision: Optional[str] = None,
+    ) -> Optional[List[Tuple[str, int]]]:
+        """Apply `hunks` to the blame `lines`, and blame the changed lines at
+        `revision`, or in the working directory.
+
+        Return None if too many lines changed, to blame the whole file instead.
+        """
+        if not hunks:
+            return lines
+        updated = apply_hunks(lines, hunks)
+        ranges = line_ranges(
+            (None, index + 1, index + 1)
+            for index, line in enumerate(updated)
+            if line is None
+        )
+        if len(ranges) > MAX_LINE_RANGES:
+            return None
+        blamed = client.blame(file, ranges, revision) if ranges else {}
+        return [
+            blamed[index] if line is None else line
+            for index, line in enumerate(updated)
+        ]
+
+    def save(self):
+        authors: Dict[str, int] = {}
+        files = {
+            file: {
+                "revision": stored["revision"],
+                "lines": [
+                    (authors.setdefault(user, len(authors)), time)
+                    for user, time in stored["lines"]
+                ],
+            }
+            for file, stored in self.files.items()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump({"authors": list(authors), "files": files}, fh)
+        os.replace(tmp_path, self.path)
+
 
 class BlameResult(TypedDict):
     authors: list[str]
     blame: BlameData
 
 
+class BlameColumns:
+    """The attribution of keys, stored in columns.
+
+    Each row has the id of a path, a key, the id of its author and its
+    timestamp. Paths and authors are numbered in the order they're added.
+    """
+
+    def __init__(self, sources: Optional[SourceTable] = None):
+        # Share the paths and keys with the dependencies of a context.
+        self.sources = sources
+        self.paths: List[str] = []
+        self.path_index: Dict[str, int] = {}
+        self.authors: List[str] = []
+        self.author_index: Dict[str, int] = {}
+        self.path_ids = array("I")
+        self.keys: List[Any] = []
+        self.author_ids = array("I")
+        self.timestamps = array("d")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def path_id(self, path: str) -> int:
+        try:
+            return self.path_index[path]
+        except KeyError:
+            pass
+        if self.sources is not None:
+            path = self.sources.intern(path)
+        id = self.path_index[path] = len(self.paths)
+        self.paths.append(path)
+        return id
+
+    def author_id(self, author: str) -> int:
+        try:
+            return self.author_index[author]
+        except KeyError:
+            pass
+        id = self.author_index[author] = len(self.authors)
+        self.authors.append(author)
+        return id
+
+    def add(self, path_id: int, key, author_id: int, timestamp: float):
+        if self.sources is not None:
+            key = self.sources.intern(key)
+        self.path_ids.append(path_id)
+        self.keys.append(key)
+        self.author_ids.append(author_id)
+        self.timestamps.append(timestamp)
+
+    def source(self, row: int) -> Tuple[str, Any]:
+        """The `(path, key)` of `row`, canonical in `sources` if set."""
+        path = self.paths[self.path_ids[row]]
+        key = self.keys[row]
+        if self.sources is None:
+            return (path, key)
+        return self.sources.source(path, key)
+
+    @classmethod
+    def from_json(
+        cls, blame_json: BlameResult, sources: Optional[SourceTable] = None
+    ) -> BlameColumns:
+        columns = cls(sources)
+        for author in blame_json["authors"]:
+            columns.author_id(author)
+        for path, keys_info in blame_json["blame"].items():
+            path_id = columns.path_id(path)
+            for key, (author_id, timestamp) in keys_info.items():
+                columns.add(path_id, key, author_id, timestamp)
+        return columns
+
+    def select(self, sources: Iterable[Tuple[str, Any]]) -> BlameColumns:
+        """The rows of `sources`, with only their paths and authors."""
+        wanted = set(sources)
+        selected = BlameColumns(self.sources)
+        for row, key in enumerate(self.keys):
+            path = self.paths[self.path_ids[row]]
+            if (path, key) in wanted:
+                selected.add(
+                    selected.path_id(path),
+                    key,
+                    selected.author_id(self.authors[self.author_ids[row]]),
+                    self.timestamps[row],
+                )
+        return selected
+
+    def to_json(self) -> BlameResult:
+        blame: BlameData = {path: {} for path in self.paths}
+        for row, key in enumerate(self.keys):
+            path = self.paths[self.path_ids[row]]
+            blame[path][key] = (self.author_ids[row], self.timestamps[row])
+        return {"authors": list(self.authors), "blame": blame}
+
+
+def read_blame_file(path: str, locale: str) -> Optional[BlameResult]:
+    """Read precomputed blame for `locale` from a JSON file.
+
+    The file holds a `BlameResult`, or a dict of them by locale, as printed by
+    `python -m fluent.migrate.blame`. Return None if the locale isn't in it.
+    """
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    if "authors" in data and "blame" in data:
+        return data
+    return data.get(locale)
+
+
 class Blame:
-    def __init__(self, client: RepoClient):
+    def __init__(
+        self,
+        client: RepoClient,
+        sources: Optional[SourceTable] = None,
+        cache: Optional[BlameCache] = None,
+        revision: Optional[str] = None,
+    ):
         self.client = client
-        self.users: list[str] = []
-        self.blame: BlameData = {}
+        # Share the paths and keys with the dependencies of a context.
+        self.sources = sources
+        # Blame the files at this revision instead of the working directory,
+        # if set. The cache only stores the blame of the working directory.
+        self.revision = revision
+        # Stored blame to update, if set.
+        self.cache = cache if revision is None else None
+        self.columns = BlameColumns(sources)
+
+    @property
+    def users(self) -> list[str]:
+        return self.columns.authors
+
+    @property
+    def blame(self) -> BlameData:
+        return self.columns.to_json()["blame"]
+
+    def attribution(
+        self,
+        file_paths: Iterable[str],
+        resources: Optional[Mapping[str, Any]] = None,
+        sources: Optional[Iterable[Tuple[str, Any]]] = None,
+    ) -> BlameResult:
+        """Attribute the translations in `file_paths`, see `attribute`."""
+        return self.attribute(file_paths, resources, sources).to_json()
+
+    def attribute(
+        self,
+        file_paths: Iterable[str],
+        resources: Optional[Mapping[str, Any]] = None,
+        sources: Optional[Iterable[Tuple[str, Any]]] = None,
+    ) -> BlameColumns:
+        """Attribute the translations in `file_paths`.
+
+        `resources` are the parsed localization resources of a context, with
+        `line_spans`. Files which aren't in them are read and parsed.
+
+        If `sources` are given as `(path, key)` tuples, only these keys are
+        attributed, and only their lines are blamed.
+        """
+        keys: Optional[Dict[str, Set[Any]]] = None
+        if sources is not None:
+            keys = {}
+            for path, key in sources:
+                keys.setdefault(path, set()).add(key)
 
-    def attribution(self, file_paths: Iterable[str]) -> BlameResult:
         for file in file_paths:
-            blame = self.client.blame(file)
-            self.handleFile(file, blame)
-        return {"authors": self.users, "blame": self.blame}
+            resource = None if resources is None else resources.get(file)
+            if hasattr(resource, "line_spans"):
+                line_spans: Iterable[Tuple[Any, int, int]] = resource.line_spans()
+            else:
+                parsed = self.readLines(file)
+                if parsed is None:
+                    continue
+                line_spans = parsed
+            if keys is None:
+                self.handleLines(file, line_spans, self.blameFile(file))
+                continue
+            needed = keys.get(file, set())
+            line_spans = [span for span in line_spans if span[0] in needed]
+            ranges = line_ranges(line_spans)
+            if not ranges:
+                blame: FileBlame = {}
+            elif self.cache is not None or len(ranges) > MAX_LINE_RANGES:
+                blame = self.blameFile(file)
+            else:
+                blame = self.client.blame(file, ranges, self.revision)
+            self.handleLines(file, line_spans, blame)
+        return self.columns
+
+    def blameFile(self, path: str) -> FileBlame:
+        if self.cache is not None:
+            return self.cache.blame(self.client, path)
+        return self.client.blame(path, revision=self.revision)
+
+    def handleFile(self, path: str, file_blame: FileBlame):
+        line_spans = self.readLines(path)
+        if line_spans is not None:
+            self.handleLines(path, line_spans, file_blame)
 
-    def handleFile(self, path: str, file_blame: list[Tuple[str, int]]):
+    def readLines(self, path: str) -> Optional[LineSpans]:
+        """Parse the file at `path` for the lines of its values."""
         try:
             parser = getParser(path)
         except UserWarning:
-            return
-
-        self.blame[path] = {}
+            return None
 
         self.readFile(parser, path)
-        entities = parser.parse()
+        return self.parseLines(parser.parse())
+
+    def parseLines(self, entities) -> LineSpans:
         for e in entities:
             if isinstance(e, Junk):
                 continue
@@ -54,16 +389,28 @@ class Blame:
                     for attr in e.attributes
                 ]
             for key, (val_start, val_end) in key_vals:
-                entity_lines = file_blame[
-                    (e.ctx.linecol(val_start)[0] - 1) : e.ctx.linecol(val_end)[0]
-                ]
-                user, timestamp = max(entity_lines, key=lambda x: x[1])
-                if user not in self.users:
-                    self.users.append(user)
-                userid = self.users.index(user)
-                self.blame[path][key] = (userid, timestamp)
+                yield key, e.ctx.linecol(val_start)[0], e.ctx.linecol(val_end)[0]
+
+    def handleLines(
+        self,
+        path: str,
+        line_spans: Iterable[Tuple[Any, int, int]],
+        file_blame: FileBlame,
+    ):
+        columns = self.columns
+        path_id = columns.path_id(path)
+        for key, first_line, last_line in line_spans:
+            entity_lines = [
+                file_blame[index] for index in range(first_line - 1, last_line)
+            ]
+            user, timestamp = max(entity_lines, key=lambda x: x[1])
+            columns.add(path_id, key, columns.author_id(user), timestamp)
 
     def readFile(self, parser, path: str):
+        if self.revision is not None:
+            data = self.client.cat(path, self.revision)
+            parser.readUnicode(decode_contents(parser, data))
+            return
         parser.readFile(join(self.client.root, path))
 
 
@@ -71,7 +418,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("repo_path")
     parser.add_argument("file_path", nargs="+")
+    parser.add_argument(
+        "--locale", help="print a dict of the blame by this locale, for --blame-file"
+    )
+    parser.add_argument("--revision", help="blame the files at this revision")
     args = parser.parse_args()
-    blame = Blame(RepoClient(args.repo_path))
+    blame = Blame(RepoClient(args.repo_path), revision=args.revision)
     attrib = blame.attribution(args.file_path)
-    print(json.dumps(attrib, indent=4, separators=(",", ": ")))
+    output = attrib if args.locale is None else {args.locale: attrib}
+    print(json.dumps(output, indent=4, separators=(",", ": ")))
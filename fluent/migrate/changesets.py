@@ -1,9 +1,11 @@
 from __future__ import annotations
-from typing import Set, Tuple, TypedDict
+from typing import Dict, Optional, Set, Tuple, TypedDict, Union
 
+from itertools import groupby
 import time
 
-from .blame import BlameResult
+from .blame import BlameColumns, BlameResult
+from .intern import SourceTable
 
 Changes = Set[Tuple[str, str]]
 
@@ -19,7 +21,10 @@ def by_first_commit(item: Changeset):
     return item["first_commit"]
 
 
-def convert_blame_to_changesets(blame_json: BlameResult) -> list[Changeset]:
+def convert_blame_to_changesets(
+    blame_json: Union[BlameResult, BlameColumns],
+    sources: Optional[SourceTable] = None,
+) -> list[Changeset]:
     """Convert a blame dict into a list of changesets.
 
     The blame information in `blame_json` should be a dict of the following
@@ -49,18 +54,65 @@ def convert_blame_to_changesets(blame_json: BlameResult) -> list[Changeset]:
             },
         ]
 
+    The blame can also be given as `BlameColumns`.
+
+    If `sources` is given, the changes are its `(path, key)` tuples.
     """
+    if isinstance(blame_json, BlameColumns):
+        columns = blame_json
+    else:
+        columns = BlameColumns.from_json(blame_json, sources)
+    if sources is not None and columns.sources is not sources:
+        columns = BlameColumns.from_json(columns.to_json(), sources)
+
     now = time.time()
     changesets: list[Changeset] = [
         {"author": author, "first_commit": now, "changes": set()}
-        for author in blame_json["authors"]
+        for author in columns.authors
     ]
 
-    for path, keys_info in blame_json["blame"].items():
-        for key, (author_index, timestamp) in keys_info.items():
-            changeset = changesets[author_index]
-            changeset["changes"].add((path, key))
-            if timestamp < changeset["first_commit"]:
-                changeset["first_commit"] = timestamp
+    # Group the rows by author.
+    author_id = columns.author_ids.__getitem__
+    timestamps = columns.timestamps
+    rows = sorted(range(len(columns)), key=author_id)
+    for id, group in groupby(rows, key=author_id):
+        group_rows = list(group)
+        changeset = changesets[id]
+        changeset["changes"].update(columns.source(row) for row in group_rows)
+        changeset["first_commit"] = min(
+            now, min(timestamps[row] for row in group_rows)
+        )
 
     return sorted(changesets, key=by_first_commit)
+
+
+def activation_schedule(
+    changesets: list[Changeset], dependencies: Dict[Tuple[str, str], Changes]
+) -> list[Set[str]]:
+    """Find the target paths with messages to migrate in each changeset.
+
+    `dependencies` are the `MigrationContext.dependencies` of the messages.
+    A message is migrated in the first changeset in which all of its
+    dependencies are known, and one of them is changed. Each legacy
+    translation is changed in only one changeset, and the known translations
+    only grow, so that's the last changeset changing one of its dependencies.
+    Messages without dependencies are migrated in the first changeset, and
+    messages with dependencies in no changeset are never migrated.
+
+    Return the set of target paths for each changeset in `changesets`.
+    """
+    changeset_index: Dict[Tuple[str, str], int] = {}
+    for index, changeset in enumerate(changesets):
+        for change in changeset["changes"]:
+            changeset_index.setdefault(change, index)
+
+    schedule: list[Set[str]] = [set() for _ in changesets]
+    if not schedule:
+        return schedule
+    for (path, _), sources in dependencies.items():
+        try:
+            index = max((changeset_index[source] for source in sources), default=0)
+        except KeyError:
+            continue
+        schedule[index].add(path)
+    return schedule
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Set, Tuple, cast
+from typing import Dict, List, Optional, Set, Tuple, cast
 
 import logging
 
@@ -7,12 +7,17 @@ import fluent.syntax.ast as FTL
 from fluent.migrate.util import fold
 
 from .transforms import Source
-from .util import get_message, skeleton
+from .util import skeleton
 from .errors import (
     EmptyLocalizationError,
     UnreadableReferenceError,
 )
 from ._context import InternalContext
+from .intern import to_mask
+from .resources import ResourceRegistry
+from .shared import SharedReferences
+from .stats import Stats
+from .storage import FileSystemStorage, Storage
 
 
 __all__ = [
@@ -22,6 +27,17 @@ __all__ = [
 ]
 
 
+def get_dependencies(node: FTL.Message | FTL.Term) -> Set[Tuple[str, str]]:
+    """Scan `node` for `Source` nodes and collect their paths and keys."""
+
+    def get_sources(acc, cur):
+        if isinstance(cur, Source):
+            acc.add((cur.path, cur.key))
+        return acc
+
+    return cast(Set[Tuple[str, str]], fold(get_sources, node, set()))
+
+
 class MigrationContext(InternalContext):
     """Stateful context for merging translation resources.
 
@@ -48,6 +64,10 @@ class MigrationContext(InternalContext):
     dependencies in the transforms. The translations from these files will be
     read from the localization_dir and transformed into FTL and merged
     into the existing FTL files for the given language.
+
+    The reference and localization files can also be read from another
+    `Storage`, like an archive or a revision of a repository, with
+    `reference_storage` and `localization_storage`.
     """
 
     def __init__(
@@ -56,15 +76,34 @@ class MigrationContext(InternalContext):
         reference_dir: str,
         localization_dir: str,
         enforce_translated=False,
+        preserve_formatting=False,
+        stats: Optional[Stats] = None,
+        shared_references: Optional[SharedReferences] = None,
+        reference_storage: Optional[Storage] = None,
+        localization_storage: Optional[Storage] = None,
     ):
         super().__init__(
             locale,
             enforce_translated=enforce_translated,
+            preserve_formatting=preserve_formatting,
+            stats=stats,
+            shared_references=shared_references,
         )
         self.locale = locale
         # Paths to directories with input data, relative to CWD.
         self.reference_dir = reference_dir
         self.localization_dir = localization_dir
+        # The files are read from these storages, if given, instead of the
+        # directories.
+        if reference_storage is None and reference_dir is not None:
+            reference_storage = FileSystemStorage(reference_dir)
+        self.reference_storage = reference_storage
+        if localization_storage is None:
+            localization_storage = FileSystemStorage(localization_dir)
+        self.localization_storage = localization_storage
+        self.localization_registry = ResourceRegistry(
+            self.read_localization_resource, localization_storage.exists
+        )
 
         self.dependencies = {}
         """
@@ -72,9 +111,18 @@ class MigrationContext(InternalContext):
         FTL translations, and values are sets of `(path, key)` tuples
         corresponding to localized entities which will be migrated.
         """
+        self.dependency_masks = {}
+        """
+        The same dependencies, as bitmasks of the ids of the sources in
+        `self.sources`.
+        """
 
     def add_transforms(
-        self, target: str, reference: str, transforms: List[FTL.Message | FTL.Term]
+        self,
+        target: str,
+        reference: str,
+        transforms: List[FTL.Message | FTL.Term],
+        dependencies: Optional[Dict[str, Set[Tuple[str, str]]]] = None,
     ):
         """Define transforms for target using reference as template.
 
@@ -92,12 +140,13 @@ class MigrationContext(InternalContext):
 
         For transforms that merely copy legacy messages or Fluent patterns,
         using `fluent.migrate.helpers.transforms_from` is recommended.
-        """
 
-        def get_sources(acc, cur):
-            if isinstance(cur, Source):
-                acc.add((cur.path, cur.key))
-            return acc
+        `dependencies` maps the ids of the transforms to their sources, if
+        they're already known. See `fluent.migrate.template`.
+
+        The files used by the transforms are only checked for existence here.
+        They're read together by `prefetch`, before the first merge.
+        """
 
         if self.reference_dir is None:
             # Add skeletons to resource body for each transform
@@ -106,46 +155,38 @@ class MigrationContext(InternalContext):
             if reference_ast is None:
                 reference_ast = FTL.Resource()
             reference_ast.body.extend(skeleton(transform) for transform in transforms)
+            self.reference_resources[target] = reference_ast
         else:
-            reference_ast = self.read_reference_ftl(reference)
-        self.reference_resources[target] = reference_ast
+            # The reference is read by `prefetch`, which also checks that the
+            # transforms are in it.
+            self.check_reference(reference)
+            _, pending = self.pending_references.get(target, (reference, []))
+            self.pending_references[target] = (reference, pending + list(transforms))
 
         for node in transforms:
             ident = cast(str, node.id.name)
-            # Scan `node` for `Source` nodes and collect the information they
-            # store into a set of dependencies.
-            dependencies = cast(Set[Tuple[str, Source]], fold(get_sources, node, set()))
-            # Set these sources as dependencies for the current transform.
-            self.dependencies[(target, ident)] = dependencies
-
-            # The target Fluent message should exist in the reference file. If
-            # it doesn't, it's probably a typo.
-            # Of course, only if we're having a reference.
-            if self.reference_dir is None:
-                continue
-            if get_message(reference_ast.body, ident) is None:
-                logger = logging.getLogger("migrate")
-                logger.warning(
-                    '{} "{}" was not found in {}'.format(
-                        type(node).__name__, ident, reference
-                    )
-                )
-
-        # Keep track of localization resource paths which were defined as
-        # sources in the transforms.
-        expected_paths = set()
-
-        # Read all legacy translation files defined in Source transforms. This
-        # may fail but a single missing legacy resource doesn't mean that the
-        # migration can't succeed.
-        for dependencies in self.dependencies.values():
-            for path in {path for path, _ in dependencies}:
-                expected_paths.add(path)
+            # Set the sources as dependencies for the current transform.
+            if dependencies is None:
+                sources = get_dependencies(node)
+            else:
+                sources = dependencies[ident]
+            ids = {self.sources.add(source) for source in sources}
+            self.dependency_masks[(target, ident)] = to_mask(ids)
+            self.dependencies[(target, ident)] = {self.sources[id] for id in ids}
+
+        # Register all legacy translation files defined in Source transforms.
+        # They're read by `prefetch`. Some may be missing but a
+        # single missing legacy resource doesn't mean that the migration can't
+        # succeed.
+        for node in transforms:
+            for path, _ in self.dependencies[(target, node.id.name)]:
                 self.maybe_add_localization(path)
 
         # However, if all legacy resources are missing, bail out early. There
         # are no translations to migrate. We'd also get errors in hg annotate.
-        if len(expected_paths) > 0 and len(self.localization_resources) == 0:
+        registry = self.localization_registry
+        if registry.expected and not registry.found:
+            registry.report_missing()
             error_message = "No localization files were found"
             logging.getLogger("migrate").error(error_message)
             raise EmptyLocalizationError(error_message)
@@ -156,5 +197,4 @@ class MigrationContext(InternalContext):
         path_transforms += transforms
 
         if target not in self.target_resources:
-            target_ast = self.read_localization_ftl(target)
-            self.target_resources[target] = target_ast
+            self.pending_targets.add(target)
@@ -8,7 +8,9 @@ They take a string argument and immediately return a corresponding AST node.
 migrated AST nodes when they are evaluated by a MigrationContext.) """
 
 from __future__ import annotations
-from typing import List
+from typing import List, Tuple
+
+from functools import lru_cache
 
 from fluent.syntax import FluentParser, ast as FTL
 from fluent.syntax.visitor import Transformer
@@ -141,8 +143,28 @@ def transforms_from(ftl, **substitutions) -> List[FTL.Message | FTL.Term]:
         new-key = Hardcoded text { COPY(file_dtd, "string.key") }
         \""", file_dtd="very/long/path/to/a/file.dtd")
 
+    The parsed transforms are cached, and each call returns fresh clones of
+    them. Recipes can thus call transforms_from for every locale cheaply.
     """
 
+    key = tuple(sorted(substitutions.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return parse_transforms(ftl, substitutions)
+    return [entry.clone() for entry in cached_transforms(ftl, key)]
+
+
+def parse_transforms(ftl, substitutions) -> List[FTL.Message | FTL.Term]:
     parser = FluentParser(with_spans=False)
     resource = parser.parse(ftl)
     return IntoTranforms(substitutions).visit(resource).body
+
+
+@lru_cache(maxsize=1024)
+def cached_transforms(ftl, substitutions) -> Tuple[FTL.Message | FTL.Term, ...]:
+    """Parsed transforms for `substitutions` as a sorted tuple of items.
+
+    The cached entries must not be modified, only cloned.
+    """
+    return tuple(parse_transforms(ftl, dict(substitutions)))
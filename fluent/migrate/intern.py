@@ -0,0 +1,80 @@
+"""Interning of legacy translation sources.
+
+The dependencies of transforms, the blame data and the changesets all refer
+to legacy translations as `(path, key)` tuples. Built independently, they'd
+hold their own copies of the same strings. A `SourceTable` stores each path
+and key once, and numbers the sources which transforms depend on with small
+integer ids. Sets of sources are bitmasks with the bits of their ids set, so
+that the dependency checks of a merge are a couple of int operations.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+SourceId = int
+SourceMask = int
+Source = Tuple[str, Any]
+"(path, key). Keys of gettext sources are tuples."
+
+
+class SourceTable:
+    def __init__(self):
+        self.strings: Dict[Hashable, Any] = {}
+        self.ids: Dict[Source, SourceId] = {}
+        self.sources: List[Source] = []
+
+    def intern(self, value):
+        """The stored copy of a path or key."""
+        return self.strings.setdefault(value, value)
+
+    def source(self, path: str, key) -> Source:
+        """A `(path, key)` tuple of stored strings.
+
+        Sources with an id are returned as the same tuple.
+        """
+        source = (self.intern(path), self.intern(key))
+        id = self.ids.get(source)
+        return source if id is None else self.sources[id]
+
+    def add(self, source: Source) -> SourceId:
+        """Get the id of `source`, numbering it if it's new."""
+        try:
+            return self.ids[source]
+        except KeyError:
+            pass
+        source = (self.intern(source[0]), self.intern(source[1]))
+        id = self.ids[source] = len(self.sources)
+        self.sources.append(source)
+        return id
+
+    def get(self, source: Source) -> Optional[SourceId]:
+        return self.ids.get(source)
+
+    def to_ids(self, sources: Iterable[Source]) -> FrozenSet[SourceId]:
+        """The ids of `sources`. Sources without an id are left out."""
+        ids = self.ids
+        return frozenset(ids[source] for source in sources if source in ids)
+
+    def mask(self, sources: Iterable[Source]) -> SourceMask:
+        """The bitmask of `sources`. Sources without an id are left out."""
+        ids = self.ids
+        bits = bytearray((len(self.sources) + 7) // 8)
+        for source in sources:
+            id = ids.get(source)
+            if id is not None:
+                bits[id >> 3] |= 1 << (id & 7)
+        return int.from_bytes(bits, "little")
+
+    def __getitem__(self, id: SourceId) -> Source:
+        return self.sources[id]
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+
+def to_mask(ids: Iterable[SourceId]) -> SourceMask:
+    """The bitmask of a few source ids."""
+    mask = 0
+    for id in ids:
+        mask |= 1 << id
+    return mask
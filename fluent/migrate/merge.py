@@ -1,6 +1,7 @@
 import fluent.syntax.ast as FTL
 
 from .errors import SkipTransform
+from .resources import ScannedResource
 from .util import get_message, get_transform
 
 
@@ -12,7 +13,16 @@ def merge_resource(ctx, reference, current, transforms, in_changeset):
     `localization` and use it if it's present; then if the string has
     a transform defined in the migration specification and if it's in the
     currently processed changeset, evaluate the transform.
+
+    If `current` is a `ScannedResource`, only the entries which are looked up
+    are parsed.
     """
+    if isinstance(current, ScannedResource):
+        get_existing = current.get_entry
+    else:
+
+        def get_existing(ident):
+            return get_message(current.body, ident)
 
     def merge_body(body):
         return [entry for entry in map(merge_entry, body) if entry is not None]
@@ -31,7 +41,7 @@ def merge_resource(ctx, reference, current, transforms, in_changeset):
         # If the message is present in the existing localization, we add it to
         # the resulting resource.  This ensures consecutive merges don't remove
         # translations but rather create supersets of them.
-        existing = get_message(current.body, ident)
+        existing = get_existing(ident)
         if existing is not None:
             return existing
 
@@ -0,0 +1,78 @@
+"""Profiling of migration runs.
+
+A `Profiler` runs code under cProfile (`cpu`) or tracemalloc (`memory`),
+writes the raw profile to a file and prints a summary of the top entries.
+Load the files with `pstats.Stats` or `tracemalloc.Snapshot.load`.
+"""
+
+from __future__ import annotations
+
+import cProfile
+from contextlib import contextmanager
+import io
+import os
+import pstats
+import re
+import tracemalloc
+
+PROFILE_KINDS = ("cpu", "memory")
+
+
+class Profiler:
+    """Profile migration runs with cProfile or tracemalloc."""
+
+    def __init__(self, kind: str, directory: str = ".", top: int = 20):
+        if kind not in PROFILE_KINDS:
+            raise ValueError(f"Unknown profile kind: {kind}")
+        self.kind = kind
+        self.directory = directory
+        self.top = top
+
+    def path(self, name: str) -> str:
+        """Path of the profile file for `name`."""
+        ext = ".prof" if self.kind == "cpu" else ".tracemalloc"
+        # Migration names are dotted module paths, locales may contain `@`.
+        filename = re.sub(r"[^\w.-]", "_", name) + ext
+        return os.path.join(self.directory, filename)
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the `with` block and write the results for `name`."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        if self.kind == "cpu":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                profile.dump_stats(path)
+                print(self.cpu_summary(profile, path))
+        else:
+            tracemalloc.start()
+            try:
+                yield
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                snapshot.dump(path)
+                print(self.memory_summary(snapshot, peak, path))
+
+    def cpu_summary(self, profile: cProfile.Profile, path: str) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        return f"  CPU profile written to {path}\n{stream.getvalue()}"
+
+    def memory_summary(
+        self, snapshot: tracemalloc.Snapshot, peak: int, path: str
+    ) -> str:
+        lines = [
+            f"  Memory profile written to {path}",
+            f"  Peak traced memory: {peak / 1024:.1f} KiB",
+        ]
+        for stat in snapshot.statistics("lineno")[: self.top]:
+            lines.append(f"    {stat}")
+        return "\n".join(lines)
@@ -1,13 +1,38 @@
 from __future__ import annotations
-from typing import Tuple
+from typing import (
+    IO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
-import json
-from subprocess import run
+import re
+from subprocess import PIPE, Popen, run
+from tempfile import TemporaryFile
+import threading
 
 from os.path import isdir, join
 
 import hglib
 
+FileBlame = Union[List[Tuple[str, int]], Dict[int, Tuple[str, int]]]
+"(author, time) of lines by 0-based line index"
+
+Hunk = Tuple[int, int, int, int]
+"Old first line and line count, new first line and line count"
+
+re_hunk = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@", re.M)
+
+# The time and user of each line of `hg annotate`.
+HG_ANNOTATE_TEMPLATE = "{lines % '{date|hgdate} {user}\\n'}"
+
 
 def git(root: str, *args: str) -> str:
     """
@@ -23,56 +48,220 @@ def git(root: str, *args: str) -> str:
     return proc.stdout
 
 
+def git_lines(root: str, *args: str) -> Iterator[bytes]:
+    """Like `git`, but yields the lines of stdout while git runs.
+
+    The lines are bytes, without their line endings.
+    """
+    # stderr goes to a file, as a pipe which isn't read while stdout is would
+    # block git once it's full.
+    with TemporaryFile() as errors:
+        with Popen(["git", *args], stdout=PIPE, stderr=errors, cwd=root) as proc:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                yield line.rstrip(b"\n")
+        errors.seek(0)
+        stderr = errors.read().decode("utf-8", "replace")
+    if proc.returncode != 0:
+        raise Exception(stderr or f"git command failed: {args}")
+
+
+def parse_porcelain(lines: Iterable[bytes]) -> Iterator[Tuple[int, Tuple[str, int]]]:
+    """Parse the output of `git blame --porcelain`.
+
+    Yield the 0-based index and the (author, time) of each line. Lines of
+    the same commit share their tuple.
+    """
+    # The author of a commit is only listed for its first line.
+    commits: Dict[bytes, Tuple[str, int]] = {}
+    commit = b""
+    final_line = 0
+    user = ""
+    header = True
+    for line in lines:
+        if header:
+            commit, _, final, *_ = line.split(b" ", 3)
+            final_line = int(final)
+            header = False
+        elif line.startswith(b"\t"):
+            yield final_line - 1, commits[commit]
+            header = True
+        elif commit in commits:
+            continue
+        elif line.startswith(b"author "):
+            user = line[7:].decode("utf-8", "replace") or "[noname]"
+        elif line.startswith(b"author-mail "):
+            email = line[11:].decode("utf-8", "replace")  # includes leading space
+            user += email if email != " <>" else " <nomail>"
+        elif line.startswith(b"author-time "):
+            commits[commit] = (user, int(line[12:]))
+
+
+def parse_annotate(output: bytes) -> List[Tuple[str, int]]:
+    """Parse the output of `hg annotate` with `HG_ANNOTATE_TEMPLATE`."""
+    lines = []
+    users: Dict[bytes, str] = {}
+    for line in output.splitlines():
+        time, _, user = line.split(b" ", 2)
+        if user not in users:
+            users[user] = user.decode("utf-8", "replace")
+        lines.append((users[user], int(time)))
+    return lines
+
+
 class RepoClient:
     def __init__(self, root: str):
         self.root = root
+        # A `git cat-file --batch` process, once files are read.
+        self._cat: Optional[Popen[bytes]] = None
+        self._cat_lock = threading.Lock()
+        self._files: Dict[Optional[str], Set[str]] = {}
+        # The path of `root` in the repository, for git objects, which are
+        # named by their paths from the top directory.
+        self.prefix = ""
         if isdir(join(root, ".hg")):
             self.hgclient = hglib.open(root, "utf-8")
         else:
             self.hgclient = None
             try:
-                stdout = git(self.root, "rev-parse", "--is-inside-work-tree")
+                stdout = git(
+                    self.root,
+                    "rev-parse",
+                    "--is-inside-work-tree",
+                    "--is-bare-repository",
+                    "--show-prefix",
+                )
             except Exception:
                 stdout = ""
-            if stdout != "true\n":
+            lines = stdout.split("\n") + ["", "", ""]
+            work_tree, bare, self.prefix = lines[:3]
+            # Bare repositories can only be read with `cat`.
+            if "true" not in (work_tree, bare):
                 raise Exception(f"Unsupported repository: {root}")
 
     def close(self):
         if self.hgclient:
             self.hgclient.close()
+        if self._cat is not None:
+            cast(IO[bytes], self._cat.stdin).close()
+            self._cat.wait()
+            cast(IO[bytes], self._cat.stdout).close()
+            self._cat = None
 
-    def blame(self, file: str) -> list[Tuple[str, int]]:
-        "Return a list of (author, time) tuples for each line in `file`."
+    def cat(self, file: str, revision: Optional[str] = None) -> bytes:
+        """Return the contents of `file` at `revision`, the last commit by
+        default.
+
+        Raises FileNotFoundError if there's no such file.
+        """
+        with self._cat_lock:
+            if self.hgclient:
+                try:
+                    return self.hgclient.cat(
+                        [join(self.root, file).encode("utf-8")],
+                        rev=revision.encode("utf-8") if revision else None,
+                    )
+                except hglib.error.CommandError:
+                    raise FileNotFoundError(f"{file} at {revision or 'tip'}")
+            if self._cat is None:
+                self._cat = Popen(
+                    ["git", "cat-file", "--batch"],
+                    stdin=PIPE,
+                    stdout=PIPE,
+                    cwd=self.root,
+                )
+            stdin = cast(IO[bytes], self._cat.stdin)
+            stdout = cast(IO[bytes], self._cat.stdout)
+            name = f"{revision or 'HEAD'}:{self.prefix}{file}"
+            stdin.write(f"{name}\n".encode("utf-8"))
+            stdin.flush()
+            # "<object> <type> <size>", or "<object> missing".
+            header = stdout.readline().split()
+            if len(header) != 3:
+                raise FileNotFoundError(f"{file} at {revision or 'HEAD'}")
+            contents = stdout.read(int(header[2]))
+            stdout.read(1)  # The newline after the contents.
+            if header[1] != b"blob":
+                raise FileNotFoundError(f"{file} at {revision or 'HEAD'}")
+            return contents
+
+    def files(self, revision: Optional[str] = None) -> Set[str]:
+        """Return the paths of all files at `revision`, the last commit by
+        default."""
+        try:
+            return self._files[revision]
+        except KeyError:
+            pass
+        if self.hgclient:
+            manifest = self.hgclient.manifest(
+                rev=revision.encode("utf-8") if revision else None
+            )
+            files = {path.decode("utf-8") for *_, path in manifest}
+        else:
+            stdout = git(
+                self.root, "ls-tree", "-r", "-z", "--name-only", revision or "HEAD"
+            )
+            files = set(stdout.split("\0")) - {""}
+        self._files[revision] = files
+        return files
+
+    def blame(
+        self,
+        file: str,
+        ranges: Optional[Sequence[Tuple[int, int]]] = None,
+        revision: Optional[str] = None,
+    ) -> FileBlame:
+        """Return a list of (author, time) tuples for each line in `file`.
+
+        With `ranges` of first and last line numbers, starting at 1, git only
+        blames these lines and returns a dict of them by line index.
+        Mercurial always annotates the whole file.
+
+        The file is blamed at `revision` if given, and in the working
+        directory otherwise.
+        """
         if self.hgclient:
             args = hglib.util.cmdbuilder(
                 b"annotate",
                 file.encode("latin-1"),
-                template="json",
-                date=True,
-                user=True,
+                template=HG_ANNOTATE_TEMPLATE,
+                rev=revision.encode("utf-8") if revision else None,
                 cwd=self.root,
             )
-            blame_json = self.hgclient.rawcommand(args)
-            return [
-                (line["user"], int(line["date"][0]))
-                for line in json.loads(blame_json)[0]["lines"]
-            ]
+            return parse_annotate(self.hgclient.rawcommand(args))
+        else:
+            args = ["blame", "--porcelain"]
+            for first, last in ranges or ():
+                args.append(f"-L{first},{last}")
+            if revision:
+                args.append(revision)
+            blamed = dict(parse_porcelain(git_lines(self.root, *args, "--", file)))
+            if ranges is not None:
+                return blamed
+            return [blamed[index] for index in range(len(blamed))]
+
+    def diff_hunks(
+        self, revision: str, file: str, to_revision: Optional[str] = None
+    ) -> List[Hunk]:
+        """The changes to `file` from `revision` to `to_revision`, or to the
+        working directory.
+
+        Raises an exception if a revision is unknown.
+        """
+        revisions = [revision] if to_revision is None else [revision, to_revision]
+        if self.hgclient:
+            diff = self.hgclient.diff(
+                [join(self.root, file).encode("utf-8")],
+                revs=[rev.encode("utf-8") for rev in revisions],
+                unified=0,
+            ).decode("utf-8", "replace")
         else:
-            lines: list[Tuple[str, int]] = []
-            user = ""
-            time = 0
-            stdout = git(self.root, "blame", "--porcelain", file)
-            for line in stdout.splitlines():
-                if line.startswith("author "):
-                    user = line[7:] or "[noname]"
-                elif line.startswith("author-mail "):
-                    email = line[11:]  # includes leading space
-                    user += email if email != ' <>' else ' <nomail>'
-                elif line.startswith("author-time "):
-                    time = int(line[12:])
-                elif line.startswith("\t"):
-                    lines.append((user, time))
-            return lines
+            diff = git(self.root, "diff", "--unified=0", *revisions, "--", file)
+        # Line counts of 1 are left out of hunk headers.
+        return [
+            (int(old_start), int(old_count or 1), int(new_start), int(new_count or 1))
+            for old_start, old_count, new_start, new_count in re_hunk.findall(diff)
+        ]
 
     def commit(self, message: str, author: str):
         "Add and commit all work tree files"
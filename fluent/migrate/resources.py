@@ -0,0 +1,511 @@
+"""Lazily parsed translation resources.
+
+Legacy resources are scanned once to index their entities by key. The values
+are only unescaped when a migration actually asks for them, which keeps small
+migrations from large legacy files cheap.
+
+Fluent resources are scanned for the identifiers and spans of their entries,
+and only parsed when the migration needs their content. Their original text
+can be kept when new entries are spliced into them.
+"""
+
+from __future__ import annotations
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import bisect
+import codecs
+import copy
+from collections.abc import Mapping
+import logging
+import re
+
+from compare_locales.parser import Junk, getParser
+import fluent.syntax.ast as FTL
+from fluent.syntax.parser import FluentParser
+from fluent.syntax.serializer import FluentSerializer
+from fluent.syntax.visitor import Visitor
+
+LineSpans = Iterator[Tuple[Any, int, int]]
+"Key -> first and last line of its value, starting at 1"
+
+
+def decode_contents(parser, data: bytes) -> str:
+    """Decode the bytes of a legacy file.
+
+    Mirrors `compare_locales.parser.Parser.readFile`: decoding errors are
+    replaced and line endings are normalized.
+    """
+    contents, _ = codecs.getdecoder(parser.encoding)(data, "replace")
+    if "\r" in contents:
+        contents = contents.replace("\r\n", "\n").replace("\r", "\n")
+    return contents
+
+
+class LegacyResource(Mapping):
+    """A legacy resource which unescapes its values on demand.
+
+    Behaves like a read-only dict of entity keys to unescaped values. The
+    source is walked once by the compare-locales parser to build an index of
+    entities; each entity only stores its spans into the shared contents.
+    """
+
+    def __init__(self, parser, enforce_translated=False):
+        self.parser = parser
+        self.entities: Dict[Any, Any] = {}
+        # Entities of bilingual files which aren't translated. They're still
+        # attributed by `Blame`.
+        self.untranslated: List[Any] = []
+        for entity in parser:
+            if isinstance(entity, Junk):
+                continue
+            if entity.localized or enforce_translated:
+                self.entities[entity.key] = entity
+            else:
+                self.untranslated.append(entity)
+        self._values: Dict[Any, str] = {}
+
+    @classmethod
+    def from_bytes(
+        cls, path: str, data: bytes, enforce_translated=False
+    ) -> LegacyResource:
+        """Parse `data`, the contents of the file at `path`."""
+        # compare-locales shares its parsers, which keep the contents they
+        # read. Copy them so that resources can be read in parallel.
+        parser = copy.copy(getParser(path))
+        parser.readUnicode(decode_contents(parser, data))
+        return cls(parser, enforce_translated)
+
+    def __getitem__(self, key) -> str:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._values[key] = self.entities[key].val
+        return value
+
+    def __contains__(self, key) -> bool:
+        return key in self.entities
+
+    def __iter__(self) -> Iterator:
+        return iter(self.entities)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def line_spans(self) -> LineSpans:
+        """The lines of the values of all entities, in source order."""
+        entities: Iterator[Any] = iter(self.entities.values())
+        if self.untranslated:
+            entities = iter(
+                sorted(
+                    [*self.entities.values(), *self.untranslated],
+                    key=lambda entity: entity.span[0],
+                )
+            )
+        for entity in entities:
+            if entity.val_span:
+                start, end = entity.val_span
+                linecol = entity.ctx.linecol
+                yield entity.key, linecol(start)[0], linecol(end)[0]
+
+
+# Lines which start a new Fluent entry. This is the heuristic the Fluent parser
+# uses to recover from Junk, so entries can be sliced out of a source and
+# parsed independently.
+re_entry_start = re.compile(r"^[a-zA-Z#-]", re.M)
+re_comment = re.compile(r"(#{1,3})(?: |\r?\n|\Z)")
+re_identifier = re.compile(r"-?([a-zA-Z][a-zA-Z0-9_-]*) *=")
+re_blank_line = re.compile(r"\n *\r?\n")
+
+
+class ScannedEntry(NamedTuple):
+    """The span of a Fluent entry in its source.
+
+    `id` is the identifier name of Messages and Terms, without the leading
+    `-` of Terms, and `None` for comments and Junk. The span of a Message or
+    Term includes its attached comment.
+    """
+
+    id: Optional[str]
+    start: int
+    end: int
+
+
+def scan_fluent(source: str) -> List[ScannedEntry]:
+    """Split Fluent `source` into entries without building an AST.
+
+    The scan only looks at the beginnings of lines. A scanned Message or Term
+    may still turn out to be Junk once it's parsed.
+    """
+    starts = [m.start() for m in re_entry_start.finditer(source)]
+    starts.append(len(source))
+    entries: List[ScannedEntry] = []
+    # The level of the comment spanning the end of `entries`, if any.
+    comment_level = 0
+    for start, end in zip(starts, starts[1:]):
+        m = re_comment.match(source, start)
+        if m:
+            level = len(m.group(1))
+            if (
+                level == comment_level
+                and re_blank_line.search(source, entries[-1].start, start) is None
+            ):
+                # Consecutive lines of the same comment.
+                entries[-1] = entries[-1]._replace(end=end)
+            else:
+                entries.append(ScannedEntry(None, start, end))
+            comment_level = level
+            continue
+        m = re_identifier.match(source, start)
+        ident = m.group(1) if m else None
+        if (
+            ident is not None
+            and comment_level == 1
+            and re_blank_line.search(source, entries[-1].start, start) is None
+        ):
+            # Attach the preceding Comment to this Message or Term.
+            entries[-1] = ScannedEntry(ident, entries[-1].start, end)
+        else:
+            entries.append(ScannedEntry(ident, start, end))
+        comment_level = 0
+    return entries
+
+
+def report_junk(path: str, resource: FTL.Resource):
+    """Log the syntax errors in a parsed Fluent resource."""
+    annots = [
+        annot
+        for entry in resource.body
+        if isinstance(entry, FTL.Junk)
+        for annot in entry.annotations
+    ]
+
+    if len(annots):
+        logger = logging.getLogger("migrate")
+        for annot in annots:
+            msg = annot.message
+            logger.warning(f"Syntax error in {path}: {msg}")
+
+
+class SpanRemover(Visitor):
+    def generic_visit(self, node):
+        if isinstance(node, FTL.SyntaxNode):
+            node.span = None
+        super().generic_visit(node)
+
+
+class FluentSourceResource:
+    """A localized Fluent resource to migrate translations from.
+
+    The source is parsed with spans to find the lines of the values of its
+    messages and their attributes for `Blame`. The spans are removed
+    afterwards, so that patterns copied from the resource don't carry them.
+    """
+
+    def __init__(self, source: str, resource: FTL.Resource):
+        newlines = [match.end() for match in re.finditer("\n", source)]
+        self.lines: List[Tuple[str, int, int]] = []
+        for entry in resource.body:
+            if not isinstance(entry, (FTL.Message, FTL.Term)):
+                continue
+            key = entry.id.name
+            if isinstance(entry, FTL.Term):
+                key = f"-{key}"
+            values = [(key, entry.value)] + [
+                (f"{key}.{attribute.id.name}", attribute.value)
+                for attribute in entry.attributes
+            ]
+            for key, value in values:
+                if value is not None:
+                    self.lines.append(
+                        (
+                            key,
+                            bisect.bisect(newlines, value.span.start) + 1,
+                            bisect.bisect(newlines, value.span.end) + 1,
+                        )
+                    )
+        SpanRemover().visit(resource)
+        self.resource = resource
+
+    @property
+    def body(self) -> List[FTL.Entry]:
+        return self.resource.body
+
+    def line_spans(self) -> LineSpans:
+        return iter(self.lines)
+
+
+class ScannedResource:
+    """A Fluent resource which is only parsed on demand.
+
+    The source is scanned for the identifiers and spans of its entries when
+    the resource is created. Single entries are parsed when they're looked
+    up. Syntax errors are logged when the entries are parsed, and right away
+    for scanned entries which can only be Junk.
+    """
+
+    def __init__(self, path: str, source: str, parser: FluentParser):
+        self.path = path
+        self.source = source
+        self.parser = parser
+        self.entries = scan_fluent(source)
+        self._parsed_entries: Dict[int, Optional[FTL.Entry]] = {}
+        for index, (ident, start, _) in enumerate(self.entries):
+            if ident is None and not re_comment.match(source, start):
+                self.parse_entry(index)
+
+    @property
+    def ids(self) -> List[str]:
+        """Identifiers of the scanned Messages and Terms, in source order."""
+        return [entry.id for entry in self.entries if entry.id is not None]
+
+    def parse_entry(self, index: int) -> Optional[FTL.Entry]:
+        """Parse the Message or Term of the scanned entry at `index`.
+
+        Return None if it doesn't parse as a Message or Term.
+        """
+        try:
+            return self._parsed_entries[index]
+        except KeyError:
+            pass
+        start, end = self.entries[index][1:]
+        parsed = self.parser.parse(self.source[start:end])
+        report_junk(self.path, parsed)
+        found = None
+        for entry in parsed.body:
+            if isinstance(entry, (FTL.Message, FTL.Term)):
+                found = entry
+                break
+        self._parsed_entries[index] = found
+        return found
+
+    def parsed_entries(self) -> List[FTL.Entry]:
+        """The Messages and Terms which were parsed so far."""
+        return [entry for entry in self._parsed_entries.values() if entry is not None]
+
+    def get_entry(self, ident: str) -> Optional[FTL.Entry]:
+        """Get the first Message or Term called `ident`."""
+        for index, entry in enumerate(self.entries):
+            if entry.id == ident:
+                found = self.parse_entry(index)
+                if found is not None:
+                    return found
+        return None
+
+    def merges_unchanged(self, reference: FTL.Resource, transforms, in_changeset):
+        """Check cheaply whether a merge would leave this resource unchanged.
+
+        Mirrors `InternalContext.messages_equal` of this resource and the
+        snapshot `merge_resource` would create. The check is conservative:
+        if it returns False, the full merge decides.
+        """
+        reference_ids = [
+            entry.id.name
+            for entry in reference.body
+            if isinstance(entry, (FTL.Message, FTL.Term))
+        ]
+        in_reference = set(reference_ids)
+        for transform in transforms:
+            ident = transform.id.name
+            if (
+                ident in in_reference
+                and in_changeset(ident)
+                and self.get_entry(ident) is None
+            ):
+                # The transform would be evaluated.
+                return False
+        present = set(self.ids)
+        merged = [ident for ident in reference_ids if ident in present]
+        return sorted(merged) == sorted(self.ids)
+
+
+def splice_resource(
+    source: ScannedResource,
+    snapshot: FTL.Resource,
+    existing: Union[FTL.Resource, ScannedResource],
+    serializer: FluentSerializer,
+) -> str:
+    """Serialize `snapshot` by splicing its new entries into `source`.
+
+    `existing` is the resource which `snapshot` was merged from. Its entries
+    keep their original text in `source`; only the Messages and Terms added
+    by the merge are serialized. Each of them is inserted after the closest
+    preceding entry of `snapshot` which exists in `source`, or before the
+    closest following one. Messages, Terms and Junk of `source` which the
+    merge dropped are cut, like in a serialized `snapshot`.
+    """
+    text = source.source
+    if isinstance(existing, ScannedResource):
+        # The merge only parsed the entries it looked up.
+        known = {id(entry) for entry in existing.parsed_entries()}
+    else:
+        known = {id(entry) for entry in existing.body}
+    spans: Dict[str, ScannedEntry] = {}
+    for scanned in source.entries:
+        if scanned.id is not None:
+            spans.setdefault(scanned.id, scanned)
+
+    insertions: Dict[int, List[str]] = {}
+    pending: List[str] = []
+    anchor: Optional[int] = None
+    for entry in snapshot.body:
+        if not isinstance(entry, (FTL.Message, FTL.Term)):
+            # Comments of the reference aren't spliced in.
+            continue
+        scanned = spans.get(entry.id.name)
+        if id(entry) in known:
+            if scanned is None:
+                continue
+            if pending:
+                insertions.setdefault(scanned.start, []).extend(pending)
+                pending = []
+            # Insert after the content of the entry, before blank lines.
+            content_end = scanned.start + len(
+                text[scanned.start : scanned.end].rstrip()
+            )
+            newline = text.find("\n", content_end, scanned.end)
+            anchor = scanned.end if newline == -1 else newline + 1
+            continue
+        serialized = serializer.serialize_entry(entry)
+        if anchor is None:
+            pending.append(serialized)
+        else:
+            insertions.setdefault(anchor, []).append(serialized)
+    # Entries appended without an anchor are separated from the text before
+    # them, so that they aren't attached to a comment.
+    separate: Optional[int] = None
+    if pending:
+        separate = len(text)
+        insertions.setdefault(separate, []).extend(pending)
+
+    # Existing Messages and Terms which are kept, by the start of their span.
+    kept = {
+        spans[entry.id.name].start
+        for entry in snapshot.body
+        if isinstance(entry, (FTL.Message, FTL.Term))
+        and id(entry) in known
+        and entry.id.name in spans
+    }
+    cuts = [
+        scanned
+        for scanned in source.entries
+        if scanned.start not in kept
+        and (scanned.id is not None or not re_comment.match(text, scanned.start))
+    ]
+
+    # Splice in the insertions and leave out the cuts, in source order.
+    # Insertions at the start of a cut go before it.
+    events = sorted(
+        [(offset, 0, offset) for offset in insertions]
+        + [(cut.start, 1, cut.end) for cut in cuts]
+    )
+    parts: List[str] = []
+    position = 0
+    for offset, is_cut, end in events:
+        if offset > position:
+            parts.append(text[position:offset])
+            position = offset
+        if is_cut:
+            position = end
+            continue
+        last = next((part for part in reversed(parts) if part), "\n")
+        if not last.endswith("\n"):
+            parts.append("\n")
+        if offset == separate:
+            lines = "".join(parts).splitlines()
+            if lines and lines[-1].strip():
+                parts.append("\n")
+        parts.extend(insertions[offset])
+    parts.append(text[position:])
+    spliced = "".join(parts)
+    if "\r\n" in text:
+        spliced = re.sub(r"(?<!\r)\n", "\r\n", spliced)
+    return spliced
+
+
+class ResourceRegistry:
+    """The localization resources which transforms migrate translations from.
+
+    Paths are registered as transforms are added, and only checked for
+    existence then. All registered resources are read at once by `load`,
+    before they're first needed, so that each file is read only once however
+    many transforms use it.
+
+    `read` and `exists` take the paths of the resources.
+    """
+
+    def __init__(self, read: Callable[[str], Any], exists: Callable[[str], bool]):
+        self.read = read
+        self.exists = exists
+        self.resources: Dict[str, Any] = {}
+        # Existing files which aren't read yet.
+        self.pending: Set[str] = set()
+        self.missing: Set[str] = set()
+        self.reported: Set[str] = set()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.resources or path in self.pending or path in self.missing
+
+    def add(self, path: str) -> bool:
+        """Register the resource at `path`. Return False if it's missing."""
+        if path in self:
+            return path not in self.missing
+        if self.exists(path):
+            self.pending.add(path)
+            return True
+        self.missing.add(path)
+        return False
+
+    @property
+    def expected(self) -> bool:
+        """Whether any resources were registered, missing or not."""
+        return bool(self.resources or self.pending or self.missing)
+
+    @property
+    def found(self) -> bool:
+        """Whether any registered resources exist."""
+        return bool(self.resources or self.pending)
+
+    def read_resource(self, path: str) -> Optional[Any]:
+        try:
+            return self.read(path)
+        except OSError:
+            return None
+
+    def load(self, map=map) -> Dict[str, Any]:
+        """Read the pending resources, and return all resources by path.
+
+        `map` is used to read the pending resources, e.g. the `map` of an
+        executor to read them in parallel.
+        """
+        if self.pending:
+            paths = sorted(self.pending)
+            for path, resource in zip(paths, map(self.read_resource, paths)):
+                if resource is None:
+                    self.missing.add(path)
+                else:
+                    self.resources[path] = resource
+            self.pending.clear()
+        if len(self.missing) > len(self.reported):
+            self.report_missing()
+        return self.resources
+
+    def report_missing(self):
+        """Log the missing resources which weren't reported yet, at once."""
+        missing = sorted(self.missing - self.reported)
+        if missing:
+            logging.getLogger("migrate").warning(
+                "Missing localization files: {}".format(", ".join(missing))
+            )
+            self.reported.update(missing)
@@ -0,0 +1,215 @@
+"""Reference resources in shared memory.
+
+When locales are migrated in a pool of processes, each worker would read and
+parse the same reference files. `SharedReferences` parses them once and
+stores their sources in a `multiprocessing.shared_memory` block, together
+with a flat table of the kind, span and identifier span of each entry.
+Workers attach to the block by name and only parse the entries they merge.
+
+A merge only needs the identifiers of the Messages and Terms of a reference,
+except for the ones which have transforms: their comments are used for the
+migrated messages. Comments of the reference are copied to the migrated
+resources. Those entries are parsed from their spans; the other Messages and
+Terms are placeholders which only have an identifier.
+"""
+
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import logging
+from multiprocessing import shared_memory
+import struct
+import sys
+
+import fluent.syntax.ast as FTL
+from fluent.syntax.parser import FluentParser
+
+from .resources import report_junk
+from .storage import Storage
+
+# Entry types, in the order of their codes in the entry table.
+ENTRY_TYPES = (
+    FTL.Message,
+    FTL.Term,
+    FTL.Comment,
+    FTL.GroupComment,
+    FTL.ResourceComment,
+    FTL.Junk,
+)
+# Number of files, number of entries.
+HEADER = struct.Struct("<II")
+# Path start and end, first entry and number of entries.
+FILE = struct.Struct("<IIII")
+# Type code, start and end, identifier start and end.
+ENTRY = struct.Struct("<BIIII")
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without taking ownership of it.
+
+    Before Python 3.13, attaching registers the block with the resource
+    tracker again. Worker processes share the tracker of their parent, which
+    created the block, so this doesn't change who owns it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    return shared_memory.SharedMemory(name)
+
+
+class SharedReferences:
+    """Parsed reference FTL files in shared memory.
+
+    Create the block with `create` in the parent process, and pass its
+    `name` to workers which `attach` to it. The creator should `unlink` the
+    block once all workers are done.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.parser = FluentParser(with_spans=False)
+        files, entries = HEADER.unpack_from(shm.buf, 0)
+        self.entries_offset = HEADER.size + files * FILE.size
+        self.data_offset = self.entries_offset + entries * ENTRY.size
+        self.files: Dict[str, Tuple[int, int]] = {}
+        for index in range(files):
+            path_start, path_end, first, count = FILE.unpack_from(
+                shm.buf, HEADER.size + index * FILE.size
+            )
+            self.files[self.text(path_start, path_end)] = (first, count)
+        # Parsed entries by their index in the entry table.
+        self._parsed: Dict[int, FTL.Entry] = {}
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(cls, storage: Storage, paths: Iterable[str]) -> SharedReferences:
+        """Parse the reference files at `paths` of `storage` into a new block.
+
+        Files which can't be read are left out, and workers read them from
+        their reference storage instead.
+        """
+        parser = FluentParser(with_spans=True)
+        data = bytearray()
+        files: List[Tuple[int, int, int, int]] = []
+        entries: List[Tuple[int, int, int, int, int]] = []
+        for path in sorted(set(paths)):
+            location = storage.location(path)
+            try:
+                source = storage.read(path).decode("utf-8")
+            except (OSError, UnicodeDecodeError) as err:
+                logging.getLogger("migrate").warning(
+                    f"Not sharing reference file {location}: {err}"
+                )
+                continue
+            resource = parser.parse(source)
+            report_junk(location, resource)
+
+            path_start = len(data)
+            data += path.encode("utf-8")
+            files.append((path_start, len(data), len(entries), len(resource.body)))
+
+            # Convert the character offsets of the spans to byte offsets.
+            base = len(data)
+            offsets = {0: 0}
+            offset_list = sorted(
+                {
+                    offset
+                    for entry in resource.body
+                    for node in (entry, getattr(entry, "id", None))
+                    if node is not None
+                    for offset in (node.span.start, node.span.end)
+                }
+            )
+            position = 0
+            for offset in offset_list:
+                offsets[offset] = offsets[position] + len(
+                    source[position:offset].encode("utf-8")
+                )
+                position = offset
+            for entry in resource.body:
+                ident = getattr(entry, "id", None)
+                entries.append(
+                    (
+                        ENTRY_TYPES.index(type(entry)),
+                        base + offsets[entry.span.start],
+                        base + offsets[entry.span.end],
+                        base + offsets[ident.span.start] if ident else 0,
+                        base + offsets[ident.span.end] if ident else 0,
+                    )
+                )
+            data += source.encode("utf-8")
+
+        size = (
+            HEADER.size + len(files) * FILE.size + len(entries) * ENTRY.size + len(data)
+        )
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        HEADER.pack_into(shm.buf, 0, len(files), len(entries))
+        offset = HEADER.size
+        for file in files:
+            FILE.pack_into(shm.buf, offset, *file)
+            offset += FILE.size
+        for entry in entries:
+            ENTRY.pack_into(shm.buf, offset, *entry)
+            offset += ENTRY.size
+        shm.buf[offset : offset + len(data)] = data
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedReferences:
+        return cls(attach_shared_memory(name), owner=False)
+
+    def close(self):
+        self._parsed.clear()
+        self.shm.close()
+
+    def unlink(self):
+        """Close and free the block. Only call this in the creator."""
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def text(self, start: int, end: int) -> str:
+        """Decode the bytes at `start:end` of the data region."""
+        offset = self.data_offset
+        return bytes(self.shm.buf[offset + start : offset + end]).decode("utf-8")
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def resource(self, path: str, idents: Optional[Iterable[str]] = None):
+        """Materialize the reference at `path`.
+
+        Messages and Terms are only parsed if they're in `idents`, or if
+        `idents` is None. The others only have an identifier.
+        """
+        if idents is not None:
+            idents = set(idents)
+        first, count = self.files[path]
+        body: List[FTL.Entry] = []
+        for index in range(first, first + count):
+            code, start, end, id_start, id_end = ENTRY.unpack_from(
+                self.shm.buf, self.entries_offset + index * ENTRY.size
+            )
+            entry_type = ENTRY_TYPES[code]
+            if entry_type is FTL.Junk:
+                body.append(FTL.Junk(self.text(start, end)))
+                continue
+            if entry_type in (FTL.Message, FTL.Term) and idents is not None:
+                ident = self.text(id_start, id_end)
+                if ident not in idents:
+                    body.append(entry_type(FTL.Identifier(ident), value=None))
+                    continue
+            body.append(self.parse_entry(index, start, end))
+        return FTL.Resource(body)
+
+    def parse_entry(self, index: int, start: int, end: int) -> FTL.Entry:
+        try:
+            return self._parsed[index]
+        except KeyError:
+            pass
+        (entry,) = self.parser.parse(self.text(start, end)).body
+        self._parsed[index] = entry
+        return entry
@@ -0,0 +1,72 @@
+"""Instrumentation of migration runs.
+
+A `Stats` instance collects the time spent in each phase of a migration and
+counters of the work done, like files read or commits made. `Migrator`
+creates one per migration and passes the resulting `StatsReport` to its
+hooks, e.g. to feed build telemetry.
+"""
+
+from __future__ import annotations
+from typing import Callable, Dict, List, TypedDict
+
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+
+class StatsReport(TypedDict):
+    migration: str
+    locale: str
+    phases: Dict[str, float]
+    "Phase name -> seconds spent"
+    counters: Dict[str, int]
+
+
+StatsHook = Callable[[StatsReport], None]
+
+
+class Stats:
+    """Phase timers and counters of a single migration run."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        # Resources are read in threads, which count them.
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Add the time spent in the `with` block to the phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self, migration: str, locale: str) -> StatsReport:
+        return {
+            "migration": migration,
+            "locale": locale,
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+        }
+
+
+def format_reports(reports: List[StatsReport], format: str) -> str:
+    """Format stats reports as `json` or human readable `text`."""
+    if format == "json":
+        return json.dumps(reports, indent=2)
+    lines = []
+    for report in reports:
+        lines.append(f"{report['migration']} for {report['locale']}:")
+        for name, seconds in report["phases"].items():
+            lines.append(f"  {name}: {seconds:.3f}s")
+        for name, value in report["counters"].items():
+            lines.append(f"  {name}: {value}")
+    return "\n".join(lines)
@@ -0,0 +1,203 @@
+"""Storage of reference and localization files.
+
+Contexts read their files from a `Storage`, and the `Migrator` writes the
+migrated files to it. Besides directories, files can be read from a zip or tar
+archive of a localization, or from a revision of its repository, without
+extracting them. A `MemoryStorage` keeps written files in memory on top of
+another storage, for dry runs.
+
+Paths are relative to the root of the storage, with `/` as separator.
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Optional, Set, Union
+
+import os
+import posixpath
+import tarfile
+import threading
+import zipfile
+
+if TYPE_CHECKING:
+    from .repo_client import RepoClient
+
+
+class Storage:
+    """Files by their relative path.
+
+    Storages are read from many threads at once.
+    """
+
+    def read(self, path: str) -> bytes:
+        """Return the contents of the file at `path`.
+
+        Raises FileNotFoundError if there's no such file.
+        """
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def write(self, path: str, data: bytes):
+        raise OSError(f"Read-only storage: {self.location(path)}")
+
+    def location(self, path: str) -> str:
+        """Describe where the file at `path` is, for messages."""
+        return path
+
+    def close(self):
+        pass
+
+
+class FileSystemStorage(Storage):
+    """Files in the directory `root`."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def read(self, path: str) -> bytes:
+        with open(self.location(path), "rb") as f:
+            return f.read()
+
+    def exists(self, path: str) -> bool:
+        return os.path.isfile(self.location(path))
+
+    def write(self, path: str, data: bytes):
+        fullpath = self.location(path)
+        fulldir = os.path.dirname(fullpath)
+        if not os.path.isdir(fulldir):
+            os.makedirs(fulldir)
+        with open(fullpath, "wb") as f:
+            f.write(data)
+
+    def location(self, path: str) -> str:
+        return os.path.join(self.root, path)
+
+
+class MemoryStorage(Storage):
+    """Files in memory, on top of the files of `base`, if given.
+
+    Written files are only kept in memory.
+    """
+
+    def __init__(
+        self, files: Optional[Dict[str, bytes]] = None, base: Optional[Storage] = None
+    ):
+        self.files: Dict[str, bytes] = dict(files or {})
+        self.base = base
+
+    def read(self, path: str) -> bytes:
+        try:
+            return self.files[path]
+        except KeyError:
+            pass
+        if self.base is None:
+            raise FileNotFoundError(f"No such file in memory: {path}")
+        return self.base.read(path)
+
+    def exists(self, path: str) -> bool:
+        return path in self.files or (self.base is not None and self.base.exists(path))
+
+    def write(self, path: str, data: bytes):
+        self.files[path] = data
+
+    def location(self, path: str) -> str:
+        # The same location before and after the file is written.
+        if self.base is not None:
+            return self.base.location(path)
+        return path
+
+    def close(self):
+        if self.base is not None:
+            self.base.close()
+
+
+class ArchiveStorage(Storage):
+    """Files in a zip or tar archive, below the directory `root` in it.
+
+    Archives are read-only.
+    """
+
+    def __init__(self, path: str, root: str = ""):
+        self.path = path
+        self.archive: Union[zipfile.ZipFile, tarfile.TarFile]
+        # Archive members of the files, by path.
+        self.members: Dict[str, Union[zipfile.ZipInfo, tarfile.TarInfo]] = {}
+        root = posixpath.normpath(root) + "/" if root else ""
+        if zipfile.is_zipfile(path):
+            self.archive = zipfile.ZipFile(path)
+            for info in self.archive.infolist():
+                if not info.is_dir():
+                    self.add_member(root, info.filename, info)
+        else:
+            self.archive = tarfile.open(path)
+            for member in self.archive.getmembers():
+                if member.isfile():
+                    self.add_member(root, member.name, member)
+        # Neither archive type can be read from many threads at once.
+        self.lock = threading.Lock()
+
+    def add_member(self, root: str, name: str, member):
+        name = posixpath.normpath(name)
+        if name.startswith(root):
+            self.members[name[len(root) :]] = member
+
+    def read(self, path: str) -> bytes:
+        try:
+            member = self.members[path]
+        except KeyError:
+            raise FileNotFoundError(f"No such file: {self.location(path)}")
+        with self.lock:
+            if isinstance(self.archive, zipfile.ZipFile):
+                return self.archive.read(member)
+            f = self.archive.extractfile(member)
+            assert f is not None
+            with f:
+                return f.read()
+
+    def exists(self, path: str) -> bool:
+        return path in self.members
+
+    def location(self, path: str) -> str:
+        return f"{self.path}:{path}"
+
+    def close(self):
+        self.archive.close()
+
+
+class RepoStorage(Storage):
+    """Files at `revision` of a repository, the last commit by default.
+
+    Written files go to the working tree, and are read from there afterwards.
+    Closing the storage doesn't close the client.
+    """
+
+    def __init__(self, client: RepoClient, revision: Optional[str] = None):
+        self.client = client
+        self.revision = revision
+        self.worktree = FileSystemStorage(client.root)
+        self.written: Set[str] = set()
+
+    def read(self, path: str) -> bytes:
+        if path in self.written:
+            return self.worktree.read(path)
+        return self.client.cat(path, self.revision)
+
+    def exists(self, path: str) -> bool:
+        return path in self.written or path in self.client.files(self.revision)
+
+    def write(self, path: str, data: bytes):
+        self.worktree.write(path, data)
+        self.written.add(path)
+
+    def location(self, path: str) -> str:
+        if path in self.written:
+            return self.worktree.location(path)
+        return f"{self.revision or 'HEAD'}:{path}"
+
+
+def open_storage(path: str) -> Storage:
+    """Open the directory or archive at `path`."""
+    if os.path.isfile(path):
+        return ArchiveStorage(path)
+    return FileSystemStorage(path)
@@ -0,0 +1,103 @@
+"""Recipes recorded once and replayed for many locales.
+
+A recipe's `migrate(ctx)` builds the same transforms for every locale, unless
+it reads `ctx.locale`. Plural categories are only used when `PLURALS` is
+evaluated, so they don't change the transforms either. A `RecipeTemplate`
+records the `add_transforms` calls of a recipe together with the sources of
+each transform, and binds copies of them to the `MigrationContext` of each
+locale without running the recipe or scanning the transforms again.
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import copy
+
+import fluent.syntax.ast as FTL
+
+from .context import get_dependencies
+
+if TYPE_CHECKING:
+    from .context import MigrationContext
+
+
+class RecordedTransforms(NamedTuple):
+    target: str
+    reference: str
+    transforms: List[FTL.Message | FTL.Term]
+    dependencies: Dict[str, Set[Tuple[str, str]]]
+
+
+class RecordingContext:
+    """Stand-in for `MigrationContext` while a recipe is recorded.
+
+    Recipes may only use `add_transforms` and `locale` of their context.
+    """
+
+    def __init__(self, locale: str):
+        self._locale = locale
+        self.locale_used = False
+        self.calls: List[RecordedTransforms] = []
+
+    @property
+    def locale(self) -> str:
+        self.locale_used = True
+        return self._locale
+
+    def add_transforms(
+        self, target: str, reference: str, transforms: List[FTL.Message | FTL.Term]
+    ):
+        transforms = list(transforms)
+        dependencies = {node.id.name: get_dependencies(node) for node in transforms}
+        self.calls.append(
+            RecordedTransforms(target, reference, transforms, dependencies)
+        )
+
+
+class RecipeTemplate:
+    """The recorded transforms of a recipe.
+
+    `locale` is the locale the recipe was recorded for, if the recipe read
+    it, and None if the template is valid for all locales.
+    """
+
+    def __init__(self, calls: List[RecordedTransforms], locale: Optional[str]):
+        self.calls = calls
+        self.locale = locale
+
+    @classmethod
+    def record(cls, migration, locale: str) -> RecipeTemplate:
+        """Run the `migrate` function of `migration` to record a template."""
+        ctx = RecordingContext(locale)
+        migration.migrate(ctx)
+        return cls(ctx.calls, locale if ctx.locale_used else None)
+
+    def bind(self, ctx: MigrationContext):
+        """Add the transforms of the recipe to `ctx`.
+
+        Evaluating transforms modifies them, so each context gets its own
+        copies.
+        """
+        for target, reference, transforms, dependencies in self.calls:
+            ctx.add_transforms(
+                target, reference, copy.deepcopy(transforms), dependencies
+            )
+
+
+class TemplateCache:
+    """Recipe templates of migrations, shared by the runs for many locales."""
+
+    def __init__(self):
+        self.templates: Dict[str, Dict[Optional[str], RecipeTemplate]] = {}
+
+    def get(self, migration, locale: str) -> RecipeTemplate:
+        templates = self.templates.setdefault(migration.__name__, {})
+        template = templates.get(None) or templates.get(locale)
+        if template is None:
+            template = RecipeTemplate.record(migration, locale)
+            templates[template.locale] = template
+        return template
+
+    def bind(self, migration, ctx: MigrationContext):
+        """Add the transforms of `migration` to `ctx`, like `migrate(ctx)`."""
+        self.get(migration, ctx.locale).bind(ctx)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from types import ModuleType
-from typing import Iterable, cast
+from typing import Iterable, Optional, cast
 
 import argparse
 from contextlib import contextmanager
@@ -9,11 +9,31 @@ import logging
 import os
 import sys
 
-from fluent.migrate.blame import Blame
-from fluent.migrate.changesets import Changes, convert_blame_to_changesets
+from fluent.migrate.blame import (
+    Blame,
+    BlameCache,
+    BlameColumns,
+    BlameResult,
+    read_blame_file,
+)
+from fluent.migrate.changesets import (
+    Changes,
+    activation_schedule,
+    convert_blame_to_changesets,
+)
 from fluent.migrate.context import MigrationContext
 from fluent.migrate.errors import MigrationError
+from fluent.migrate.profiling import PROFILE_KINDS, Profiler
 from fluent.migrate.repo_client import RepoClient
+from fluent.migrate.shared import SharedReferences
+from fluent.migrate.template import TemplateCache
+from fluent.migrate.stats import Stats, StatsHook, StatsReport, format_reports
+from fluent.migrate.storage import (
+    MemoryStorage,
+    RepoStorage,
+    Storage,
+    open_storage,
+)
 
 
 @contextmanager
@@ -26,13 +46,52 @@ def dont_write_bytecode():
 
 class Migrator:
     def __init__(
-        self, locale: str, reference_dir: str, localization_dir: str, dry_run: bool
+        self,
+        locale: str,
+        reference_dir: str,
+        localization_dir: str,
+        dry_run: bool,
+        preserve_formatting: bool = False,
+        stats_hooks: Iterable[StatsHook] = (),
+        profiler: Optional[Profiler] = None,
+        templates: Optional[TemplateCache] = None,
+        shared_references: Optional[SharedReferences] = None,
+        blame_cache: Optional[BlameCache] = None,
+        blame: Optional[BlameResult] = None,
+        localization_revision: Optional[str] = None,
+        storage: Optional[Storage] = None,
     ):
         self.locale = locale
         self.reference_dir = reference_dir
         self.localization_dir = localization_dir
         self.dry_run = dry_run
+        self.preserve_formatting = preserve_formatting
+        # Callables receiving the StatsReport of each migration run.
+        self.stats_hooks = list(stats_hooks)
+        self.stats = Stats()
+        # Profile each migration run, if set.
+        self.profiler = profiler
+        # Recipe templates shared with the migrators of other locales, if set.
+        self.templates = templates
+        # Reference resources in shared memory, if set.
+        self.shared_references = shared_references
+        # Stored blame of legacy files, updated and saved on close, if set.
+        self.blame_cache = blame_cache
+        # Precomputed blame of the localization files, used instead of
+        # blaming them, if set.
+        self.blame = blame
+        # Read the localization files at this revision of the repository
+        # instead of the working tree, if set.
+        self.localization_revision = localization_revision
         self._client = None
+        # Reference files are read from the directory or archive.
+        self.reference_storage = (
+            open_storage(reference_dir) if reference_dir is not None else None
+        )
+        # Localization files are read from and written to `storage`, if set,
+        # or the directory or archive.
+        self._storage = storage
+        self._memory: Optional[MemoryStorage] = None
 
     @property
     def client(self):
@@ -40,20 +99,70 @@ class Migrator:
             self._client = RepoClient(self.localization_dir)
         return self._client
 
+    @property
+    def storage(self) -> Storage:
+        """The storage of the localization files, in memory for dry runs."""
+        if self._storage is None:
+            if self.localization_revision:
+                self._storage = RepoStorage(self.client, self.localization_revision)
+            else:
+                self._storage = open_storage(self.localization_dir)
+        if not self.dry_run:
+            return self._storage
+        if self._memory is None:
+            self._memory = MemoryStorage(base=self._storage)
+        return self._memory
+
     def close(self):
+        if self._storage is not None:
+            self._storage.close()
+        if self.reference_storage is not None:
+            self.reference_storage.close()
         # close hglib.client, if we cached one.
         if self._client is not None:
             self._client.close()
+        if self.blame_cache is not None:
+            self.blame_cache.save()
 
     def run(self, migration: ModuleType):
+        self.stats = Stats()
+        try:
+            if self.profiler is None:
+                self.run_migration(migration)
+            else:
+                name = f"{migration.__name__}-{self.locale}"
+                with self.profiler.profile(name):
+                    self.run_migration(migration)
+        finally:
+            report = self.stats.report(migration.__name__, self.locale)
+            for hook in self.stats_hooks:
+                hook(report)
+
+    def run_migration(self, migration: ModuleType):
         print("\nRunning migration {} for {}".format(migration.__name__, self.locale))
 
         # For each migration create a new context.
-        ctx = MigrationContext(self.locale, self.reference_dir, self.localization_dir)
+        ctx = MigrationContext(
+            self.locale,
+            self.reference_dir,
+            self.localization_dir,
+            preserve_formatting=self.preserve_formatting,
+            stats=self.stats,
+            shared_references=self.shared_references,
+            reference_storage=self.reference_storage,
+            localization_storage=self.storage,
+        )
 
         try:
             # Add the migration spec.
-            migration.migrate(ctx)
+            with self.stats.phase("recipe"):
+                if self.templates is None:
+                    migration.migrate(ctx)
+                else:
+                    self.templates.bind(migration, ctx)
+            # Read all files of the transforms at once.
+            with self.stats.phase("read"):
+                ctx.prefetch()
         except MigrationError as e:
             print(
                 "  Skipping migration {} for {}:\n    {}".format(
@@ -69,15 +178,39 @@ class Migrator:
         # Annotate localization files used as sources by this migration
         # to preserve attribution of translations.
         files = ctx.localization_resources.keys()
-        blame = Blame(self.client).attribution(files)
-        changesets = convert_blame_to_changesets(blame)
+        with self.stats.phase("blame"):
+            # Only the sources of transforms are attributed.
+            if self.blame is not None:
+                blame = BlameColumns.from_json(self.blame, ctx.sources).select(
+                    ctx.sources.sources
+                )
+            else:
+                blame = Blame(
+                    self.client,
+                    ctx.sources,
+                    self.blame_cache,
+                    self.localization_revision,
+                ).attribute(files, ctx.localization_resources, ctx.sources.sources)
+            changesets = convert_blame_to_changesets(blame, ctx.sources)
+            schedule = activation_schedule(changesets, ctx.dependencies)
         known_legacy_translations = set()
 
-        for changeset in changesets:
+        for changeset, paths in zip(changesets, schedule):
+            self.stats.count("changesets")
+            # The first changeset merges all paths, to migrate the messages
+            # without dependencies and to drop obsolete ones. Later
+            # changesets only change the paths with messages to migrate.
+            if changeset is changesets[0]:
+                paths = None
+            elif not paths:
+                known_legacy_translations.update(changeset["changes"])
+                self.stats.count("changesets_skipped")
+                continue
             snapshot = self.snapshot(
-                ctx, changeset["changes"], known_legacy_translations
+                ctx, changeset["changes"], known_legacy_translations, paths
             )
             if not snapshot:
+                self.stats.count("changesets_skipped")
                 continue
             self.serialize_changeset(snapshot)
             index += 1
@@ -88,25 +221,26 @@ class Migrator:
         ctx: MigrationContext,
         changes_in_changeset: Changes,
         known_legacy_translations: Changes,
+        paths: Optional[Iterable[str]] = None,
     ):
         """Run the migration for the changeset, with the set of
         this and all prior legacy translations.
+
+        If `paths` is given, only these target paths are migrated.
         """
         known_legacy_translations.update(changes_in_changeset)
-        return ctx.serialize_changeset(changes_in_changeset, known_legacy_translations)
+        return ctx.serialize_changeset(
+            changes_in_changeset, known_legacy_translations, paths
+        )
 
     def serialize_changeset(self, snapshot):
-        """Write serialized FTL files to disk."""
+        """Write serialized FTL files to the storage, in memory for dry runs."""
         for path, content in snapshot.items():
-            fullpath = os.path.join(self.localization_dir, path)
-            print(f"  Writing to {fullpath}")
-            if not self.dry_run:
-                fulldir = os.path.dirname(fullpath)
-                if not os.path.isdir(fulldir):
-                    os.makedirs(fulldir)
-                with open(fullpath, "wb") as f:
-                    f.write(content.encode("utf8"))
-                    f.close()
+            print(f"  Writing to {self.storage.location(path)}")
+            with self.stats.phase("write"):
+                data = content.encode("utf8")
+                self.storage.write(path, data)
+            self.stats.count("bytes_written", len(data))
 
     def commit_changeset(self, description_template: str, author: str, index: int):
         message = description_template.format(index=index, author=author)
@@ -115,7 +249,9 @@ class Migrator:
         if self.dry_run:
             return
         try:
-            self.client.commit(message, author)
+            with self.stats.phase("commit"):
+                self.client.commit(message, author)
+            self.stats.count("commits")
         except Exception as err:
             print(
                 "    \x1b[1;37;41mWARNING:\x1b[0m",  # bright white fg, red bg
@@ -129,15 +265,70 @@ def main(
     localization_dir: str,
     migrations: Iterable[ModuleType],
     dry_run: bool,
+    preserve_formatting: bool = False,
+    stats: Optional[str] = None,
+    stats_file: Optional[str] = None,
+    profiler: Optional[Profiler] = None,
+    blame_cache: Optional[str] = None,
+    blame_file: Optional[str] = None,
+    localization_revision: Optional[str] = None,
 ):
-    """Run migrations and commit files with the result."""
-    migrator = Migrator(locale, reference_dir, localization_dir, dry_run)
+    """Run migrations and commit files with the result.
+
+    If `stats` is given, print the stats of each migration in that format,
+    `text` or `json`, or write them to `stats_file`. If only `stats_file` is
+    given, the stats are written to it as `json`.
+
+    If `blame_cache` is given, the blame of legacy files is stored in that
+    file, and only their changes since are blamed in later runs.
+
+    If `blame_file` is given, the blame of the locale is read from it instead,
+    see `read_blame_file`.
+
+    If `localization_revision` is given, the localization files are read at
+    that revision of the repository instead of its working tree.
+    """
+    if stats_file and not stats:
+        stats = "json"
+
+    blame = None
+    if blame_file:
+        blame = read_blame_file(blame_file, locale)
+        if blame is None and os.path.isfile(localization_dir):
+            # Archives can't be blamed.
+            raise SystemExit(f"No blame for {locale} in {blame_file}")
+        if blame is None:
+            logging.getLogger("migrate").warning(
+                f"No blame for {locale} in {blame_file}, blaming the files instead"
+            )
+
+    reports: list[StatsReport] = []
+    migrator = Migrator(
+        locale,
+        reference_dir,
+        localization_dir,
+        dry_run,
+        preserve_formatting,
+        stats_hooks=[reports.append] if stats else (),
+        profiler=profiler,
+        blame_cache=BlameCache(blame_cache) if blame_cache else None,
+        blame=blame,
+        localization_revision=localization_revision,
+    )
 
     for migration in migrations:
         migrator.run(migration)
 
     migrator.close()
 
+    if stats:
+        formatted = format_reports(reports, stats)
+        if stats_file:
+            with open(stats_file, "w") as f:
+                f.write(formatted + "\n")
+        else:
+            print(formatted)
+
 
 def cli():
     parser = argparse.ArgumentParser(description="Migrate translations to FTL.")
@@ -152,22 +343,85 @@ def cli():
         "--locale", "--lang", type=str, help="target locale code (--lang is deprecated)"
     )
     parser.add_argument(
-        "--reference-dir", type=str, help="directory with reference FTL files"
+        "--reference-dir",
+        type=str,
+        help="directory with reference FTL files, or a zip or tar archive of them",
     )
     parser.add_argument(
-        "--localization-dir", type=str, help="directory for localization files"
+        "--localization-dir",
+        type=str,
+        help="directory for localization files, or a zip or tar archive of them "
+        "for dry runs",
     )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="do not write to disk nor commit any changes",
     )
+    parser.add_argument(
+        "--preserve-formatting",
+        action="store_true",
+        help="keep the text of existing localization files and only insert "
+        "migrated messages into them",
+    )
+    parser.add_argument(
+        "--stats",
+        choices=["text", "json"],
+        help="print timings and counters of each migration in this format",
+    )
+    parser.add_argument(
+        "--stats-file",
+        type=str,
+        help="write the stats to this file instead, as json unless --stats is given",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_KINDS,
+        help="profile each migration with cProfile (cpu) or tracemalloc (memory)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=".",
+        help="directory for the profile files (default: current directory)",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="number of entries in the printed profile summary (default: 20)",
+    )
+    parser.add_argument(
+        "--blame-cache",
+        type=str,
+        help="store the blame of legacy files in this file, and only blame "
+        "their changes since in later runs",
+    )
+    parser.add_argument(
+        "--blame-file",
+        type=str,
+        help="read the blame of the localization files from this JSON file, as "
+        "printed by python -m fluent.migrate.blame, instead of the repository",
+    )
+    parser.add_argument(
+        "--localization-revision",
+        type=str,
+        help="read the localization files at this revision of the repository "
+        "instead of its working tree",
+    )
     parser.set_defaults(dry_run=False)
 
     logger = logging.getLogger("migrate")
     logger.setLevel(logging.INFO)
 
     args = parser.parse_args()
+    if args.localization_dir and os.path.isfile(args.localization_dir):
+        # Archives can't be written to, committed to, or blamed.
+        if not args.dry_run or not args.blame_file:
+            parser.error(
+                "--localization-dir can only be an archive with --dry-run and "
+                "--blame-file"
+            )
 
     # Don't byte-compile migrations.
     # They're not our code, and infrequently run
@@ -180,6 +434,17 @@ def cli():
         localization_dir=args.localization_dir,
         migrations=migrations,
         dry_run=args.dry_run,
+        preserve_formatting=args.preserve_formatting,
+        stats=args.stats,
+        stats_file=args.stats_file,
+        profiler=(
+            Profiler(args.profile, args.profile_dir, args.profile_top)
+            if args.profile
+            else None
+        ),
+        blame_cache=args.blame_cache,
+        blame_file=args.blame_file,
+        localization_revision=args.localization_revision,
     )
 
 
@@ -61,7 +61,10 @@ TextElement by PLURALS and then run through the REPLACE_IN_TEXT transform.
     )
 """
 
+from typing import Tuple
+
 import re
+import sys
 
 from fluent.syntax import ast as FTL
 from fluent.syntax.visitor import Transformer
@@ -117,7 +120,58 @@ def extract_whitespace(regex, element):
         return None, element
 
 
+# The descriptor of the instance dict of all AST nodes.
+instance_dict = FTL.BaseNode.__dict__["__dict__"]
+
+
 class Transform(FTL.BaseNode):
+    """Base class for Transforms.
+
+    Large recipes create many Transforms, so their fields are stored in
+    `__slots__`. fluent.syntax walks nodes with `vars()`, which returns the
+    `__dict__` property: a new dict of the fields in the slots, and of the
+    attributes of subclasses which don't define `__slots__`. Changing that
+    dict doesn't change the node; use `setattr` instead.
+    """
+
+    __slots__ = ()
+    _field_names: Tuple[str, ...] = ()
+    _has_dict = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_names = tuple(
+            name
+            for base in reversed(cls.__mro__)
+            if issubclass(base, Transform)
+            for name in base.__dict__.get("__slots__", ())
+        )
+        # Only subclasses without __slots__ store attributes in a dict.
+        cls._has_dict = any(
+            "__slots__" not in base.__dict__
+            for base in cls.__mro__
+            if issubclass(base, Transform)
+        )
+
+    @property
+    def __dict__(self):
+        fields = {}
+        for name in self._field_names:
+            try:
+                fields[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        if self._has_dict:
+            fields.update(instance_dict.__get__(self))
+        return fields
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __call__(self, ctx):
         raise NotImplementedError
 
@@ -184,8 +238,12 @@ class Source(Transform):
     second is a key representing legacy string IDs, or Fluent id.attr.
     """
 
+    __slots__ = ("path", "key")
+
     def __init__(self, path, key):
-        self.path = path
+        # Many transforms share the same paths. Keys are mostly unique, and
+        # aren't worth adding to the table of interned strings.
+        self.path = sys.intern(path)
         self.key = key
 
 
@@ -195,6 +253,8 @@ class FluentSource(Source):
     When evaluated, it clones the Pattern of the parsed source.
     """
 
+    __slots__ = ()
+
     def __init__(self, path, key):
         if not path.endswith(".ftl"):
             raise NotSupportedError(
@@ -220,7 +280,7 @@ class COPY_PATTERN(FluentSource):
     to the localization.
     """
 
-    pass
+    __slots__ = ()
 
 
 class TransformPattern(FluentSource, Transformer):
@@ -273,6 +333,8 @@ class LegacySource(Source):
     translation's content. Set `trim=False` to disable this behavior.
     """
 
+    __slots__ = ("trim",)
+
     def __init__(self, path, key, trim=None):
         if path.endswith(".ftl"):
             raise NotSupportedError(
@@ -306,6 +368,8 @@ class LegacySource(Source):
 class COPY(LegacySource):
     """Create a Pattern with the translation value from the given source."""
 
+    __slots__ = ()
+
     def __call__(self, ctx):
         element = super().__call__(ctx)
         return Transform.pattern_of(element)
@@ -356,6 +420,8 @@ class REPLACE_IN_TEXT(Transform):
     TextElement or Expression to be interpolated.
     """
 
+    __slots__ = ("element", "replacements", "normalize_printf")
+
     def __init__(self, element, replacements, normalize_printf=False):
         self.element = element
         self.replacements = replacements
@@ -412,6 +478,8 @@ class REPLACE(LegacySource):
     replaced with FTL placeables using the `REPLACE_IN_TEXT` transform.
     """
 
+    __slots__ = ("replacements", "normalize_printf")
+
     def __init__(self, path, key, replacements, **kwargs):
         # We default normalize_printf to False except for .properties files.
         # We still allow the caller to override the default value.
@@ -444,6 +512,8 @@ class PLURALS(LegacySource):
     creates a valid Pattern from the TextElement passed into it.
     """
 
+    __slots__ = ("selector", "foreach")
+
     DEFAULT_ORDER = ("zero", "one", "two", "few", "many", "other")
 
     def __init__(self, path, key, selector, foreach=Transform.pattern_of, **kwargs):
@@ -538,6 +608,8 @@ class CONCAT(Transform):
        COPY("file.properties", "hello")
     """
 
+    __slots__ = ("elements",)
+
     def __init__(self, *elements, **kwargs):
         # We want to support both passing elements as *elements in the
         # migration specs and as elements=[]. The latter is used by
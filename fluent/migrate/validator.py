@@ -1,6 +1,14 @@
+from __future__ import annotations
+from typing import Dict, List, Optional
+
 import argparse
 import ast
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from importlib import metadata
 from itertools import zip_longest
+import json
+import os
 
 from fluent.migrate import transforms
 from fluent.migrate.errors import MigrationError
@@ -94,6 +102,16 @@ class Validator:
         visitor.visit(migrate_func)
         return {
             "references": visitor.references,
+            "dependencies": [
+                {
+                    **dependency,
+                    "sources": {
+                        path: sorted(keys)
+                        for path, keys in sorted(dependency["sources"].items())
+                    },
+                }
+                for dependency in visitor.dependencies
+            ],
             "issues": visitor.issues,
         }
 
@@ -109,6 +127,15 @@ def full_name(node, global_assigns):
 
 
 PATH_TYPES = (str,) + (ast.Call,)
+# Placeholder for paths passed to transforms_from as calls.
+RUNTIME_PATH = "determined at runtime"
+
+
+def inline_transforms(node):
+    """Check that the transforms aren't passed in variables."""
+    if isinstance(node, ast.BinOp):
+        return inline_transforms(node.left) and inline_transforms(node.right)
+    return isinstance(node, (ast.List, ast.Call))
 
 
 class MigrateAnalyzer(ast.NodeVisitor):
@@ -119,6 +146,27 @@ class MigrateAnalyzer(ast.NodeVisitor):
         self.depth = 0
         self.issues = []
         self.references = set()
+        # One entry for each call to add_transforms, with the target and
+        # reference paths and the legacy or Fluent sources of its transforms.
+        # `complete` is False if some of them can only be known at runtime.
+        self.dependencies = []
+        self.dependency = None
+
+    def resolve(self, node):
+        """The value of a constant or a name assigned a constant, or None."""
+        if isinstance(node, ast.Name):
+            node = self.global_assigns.get(node.id)
+        if isinstance(node, ast.Constant):
+            node = node.value
+        return node if isinstance(node, str) else None
+
+    def add_source(self, path, key):
+        if self.dependency is None:
+            return
+        if isinstance(path, str) and isinstance(key, str):
+            self.dependency["sources"].setdefault(path, set()).add(key)
+        else:
+            self.dependency["complete"] = False
 
     def generic_visit(self, node):
         self.depth += 1
@@ -199,11 +247,22 @@ class MigrateAnalyzer(ast.NodeVisitor):
         # Checked node.args[1].
         # There's not a lot we can say about our target path,
         # ignoring that.
+        target = self.resolve(node.args[0])
+        self.dependency = {
+            "target": target,
+            "reference": in_reference,
+            "sources": {},
+            "complete": target is not None and inline_transforms(node.args[2]),
+        }
+        self.dependencies.append(self.dependency)
         # For our transforms, we want more checks.
         self.generic_visit(node.args[2])
+        self.dependency = None
 
     def call_transform(self, node, dotted):
         module, called = dotted.rsplit(".", 1)
+        # Sources may be nested in other transforms, like CONCAT.
+        self.generic_visit(node)
         if module not in ("fluent.migrate", "fluent.migrate.transforms"):
             return
         transform = getattr(transforms, called)
@@ -220,6 +279,7 @@ class MigrateAnalyzer(ast.NodeVisitor):
             check_kwargs=False,
         ):
             self.issues.append({"msg": bad_args, "line": node.lineno})
+            self.add_source(None, None)
             return
         path = node.args[0]
         if isinstance(path, ast.Constant):
@@ -228,6 +288,7 @@ class MigrateAnalyzer(ast.NodeVisitor):
             path = self.global_assigns.get(path.id)
         if not isinstance(path, PATH_TYPES):
             self.issues.append({"msg": bad_args, "line": node.lineno})
+        self.add_source(path, self.resolve(node.args[1]))
 
     def call_helpers_transforms_from(self, node):
         args_msg = "Expected arguments to transforms_from: " "str, **substitions"
@@ -248,7 +309,7 @@ class MigrateAnalyzer(ast.NodeVisitor):
             if isinstance(v, ast.Name):
                 v = self.global_assigns.get(v.id)
             if isinstance(v, ast.Call):
-                v = "determined at runtime"
+                v = RUNTIME_PATH
             if not isinstance(v, PATH_TYPES):
                 msg = "Bad keyword arg {} to transforms_from".format(keyword.arg)
                 self.issues.append(
@@ -281,6 +342,8 @@ class MigrateAnalyzer(ast.NodeVisitor):
             }
             for issue in set(ti.issues)
         )
+        for path, key in ti.sources:
+            self.add_source(None if path == RUNTIME_PATH else path, key)
 
     def check_arguments(self, node, argspec, check_kwargs=True, allow_more=False):
         if check_kwargs and (
@@ -301,10 +364,12 @@ class TransformsInspector(Visitor):
     def __init__(self):
         super().__init__()
         self.issues = []
+        self.sources = []
 
     def generic_visit(self, node):
         if isinstance(node, transforms.Source):
             src = node.path
+            self.sources.append((src, node.key))
             # Source needs paths to be normalized
             # https://bugzilla.mozilla.org/show_bug.cgi?id=1568199
             if src != mozpath.normpath(src):
@@ -312,12 +377,148 @@ class TransformsInspector(Visitor):
         super().generic_visit(node)
 
 
+def validate_recipe(path, code):
+    """Validate a recipe and return JSON-serializable details.
+
+    Errors which stop the validation are reported as issues. Unexpected
+    errors, like imports of unknown transforms, are also marked with an
+    `error` key, so that their results aren't cached.
+    """
+    try:
+        details = Validator.validate(path, code)
+    except (MigrateNotFoundException, BadContextAPIException, SyntaxError) as e:
+        line = getattr(e, "lineno", None) or 0
+        return {
+            "references": [],
+            "dependencies": [],
+            "issues": [{"msg": str(e), "line": line}],
+        }
+    except Exception as e:
+        return {
+            "references": [],
+            "dependencies": [],
+            "issues": [{"msg": f"{type(e).__name__}: {e}", "line": 0}],
+            "error": True,
+        }
+    return {
+        "references": sorted(details["references"]),
+        "dependencies": details["dependencies"],
+        "issues": details["issues"],
+    }
+
+
+def migrate_version():
+    try:
+        return metadata.version("fluent.migrate")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+class ValidationCache:
+    """Validation results stored in a JSON file.
+
+    Results are keyed by the hash of the recipe source. The whole cache is
+    dropped when it was written by a different version of fluent.migrate.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = migrate_version()
+        self.results: Dict[str, dict] = {}
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == self.version:
+            self.results = data.get("results", {})
+
+    @staticmethod
+    def key(code):
+        return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump({"version": self.version, "results": self.results}, fh)
+        os.replace(tmp_path, self.path)
+
+
+def validate_recipes(
+    paths: List[str], cache_path: Optional[str] = None, jobs: Optional[int] = None
+) -> Dict[str, dict]:
+    """Validate many recipes, in parallel processes.
+
+    Return the details of `validate_recipe` for each path. If `cache_path` is
+    given, only recipes which changed since they were last validated are
+    validated again. `jobs` is the number of processes, the CPU count by
+    default.
+    """
+    cache = ValidationCache(cache_path) if cache_path else None
+    results: Dict[str, dict] = {}
+    pending: Dict[str, str] = {}
+    for path in paths:
+        with open(path) as fh:
+            code = fh.read()
+        if cache is not None:
+            cached = cache.results.get(cache.key(code))
+            if cached is not None:
+                results[path] = cached
+                continue
+        pending[path] = code
+
+    if len(pending) > 1 and jobs != 1:
+        workers = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            validated = executor.map(
+                validate_recipe,
+                pending.keys(),
+                pending.values(),
+                chunksize=max(1, len(pending) // (4 * workers)),
+            )
+            results.update(zip(pending.keys(), validated))
+    else:
+        for path, code in pending.items():
+            results[path] = validate_recipe(path, code)
+
+    failed = {path for path in pending if results[path].pop("error", False)}
+    if cache is not None and pending:
+        for path, code in pending.items():
+            if path not in failed:
+                cache.results[cache.key(code)] = results[path]
+        cache.save()
+    return {path: results[path] for path in paths}
+
+
 def cli():
     parser = argparse.ArgumentParser()
-    parser.add_argument("migration")
+    parser.add_argument("migrations", nargs="+", metavar="migration")
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="file to cache the results in, to only validate changed recipes",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="number of processes to validate with (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print the references, dependencies and issues of each recipe as JSON",
+    )
     args = parser.parse_args()
-    issues = Validator.validate(args.migration)["issues"]
-    for issue in issues:
-        # bright red fg
-        print(f"\x1b[1;31m{issue['msg']} at line {issue['line']}\x1b[0m")
-    return 1 if issues else 0
+    results = validate_recipes(args.migrations, args.cache, args.jobs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 1 if any(details["issues"] for details in results.values()) else 0
+    has_issues = False
+    for path, details in results.items():
+        for issue in details["issues"]:
+            has_issues = True
+            prefix = f"{path}: " if len(results) > 1 else ""
+            # bright red fg
+            print(f"\x1b[1;31m{prefix}{issue['msg']} at line {issue['line']}\x1b[0m")
+    return 1 if has_issues else 0
@@ -6,8 +6,16 @@ import shutil
 import tempfile
 import hglib
 
-from fluent.migrate.blame import Blame
-from fluent.migrate.repo_client import RepoClient, git
+from fluent.migrate.blame import Blame, BlameCache, apply_hunks, line_ranges
+from fluent.migrate.context import MigrationContext
+from fluent.migrate.repo_client import (
+    RepoClient,
+    git,
+    git_lines,
+    parse_annotate,
+    parse_porcelain,
+)
+from fluent.migrate.storage import RepoStorage
 
 
 class MockedBlame(Blame):
@@ -72,6 +80,60 @@ jane = first
         )
 
 
+class TestLineRanges(unittest.TestCase):
+    def test_merge(self):
+        spans = [("c", 7, 9), ("a", 1, 1), ("b", 2, 3), ("d", 8, 8), ("e", 11, 11)]
+        self.assertEqual(line_ranges(spans), [(1, 3), (7, 9), (11, 11)])
+
+
+class TestApplyHunks(unittest.TestCase):
+    def test_apply(self):
+        lines = [("a", 1), ("b", 2), ("c", 3), ("d", 4)]
+        # Insert one line at the top, change line 2, remove line 4.
+        hunks = [(0, 0, 1, 1), (2, 1, 3, 2), (4, 1, 5, 0)]
+        self.assertEqual(
+            apply_hunks(lines, hunks), [None, ("a", 1), None, None, ("c", 3)]
+        )
+
+
+class TestParseBlame(unittest.TestCase):
+    def test_porcelain(self):
+        a = b"a" * 40
+        b = b"b" * 40
+        output = [
+            a + b" 1 1 1",
+            b"author J\xc3\xbcrgen",
+            b"author-mail <j@example.com>",
+            b"author-time 10000",
+            b"author-tz +0000",
+            b"filename file.properties",
+            b"\tone = first",
+            b + b" 2 2 1",
+            b"author ",
+            b"author-mail <>",
+            b"author-time 11000",
+            b"\tauthor = second",
+            a + b" 3 3",
+            b"\tthree = third",
+        ]
+        blamed = list(parse_porcelain(output))
+        self.assertEqual(
+            blamed,
+            [
+                (0, ("Jürgen <j@example.com>", 10000)),
+                (1, ("[noname] <nomail>", 11000)),
+                (2, ("Jürgen <j@example.com>", 10000)),
+            ],
+        )
+        self.assertIs(blamed[0][1], blamed[2][1])
+
+    def test_annotate(self):
+        output = "1272837600 -7200 Hüsker Dü\n1335996000 0 😂\n".encode()
+        self.assertEqual(
+            parse_annotate(output), [("Hüsker Dü", 1272837600), ("😂", 1335996000)]
+        )
+
+
 class TestHgIntegration(unittest.TestCase):
     def setUp(self):
         self.root = tempfile.mkdtemp()
@@ -171,3 +233,157 @@ class TestGitIntegration(unittest.TestCase):
                 },
             },
         )
+
+    def test_attribution_resources(self):
+        ctx = MigrationContext("de", self.root, self.root)
+        ctx.maybe_add_localization("d1/f1.ftl")
+        resources = ctx.localization_resources
+        blame = Blame(RepoClient(self.root))
+        # The file isn't read and parsed again.
+        blame.readFile = None
+        rv = blame.attribution(["d1/f1.ftl"], resources)
+        self.assertEqual(
+            rv["blame"],
+            {
+                "d1/f1.ftl": {
+                    "one": (0, self.timestamps[0]),
+                    "two": (1, self.timestamps[1]),
+                }
+            },
+        )
+
+    def test_attribution_sources(self):
+        blame = Blame(RepoClient(self.root))
+        rv = blame.attribution(["d1/f1.ftl"], sources=[("d1/f1.ftl", "two")])
+        self.assertEqual(
+            rv,
+            {
+                "authors": ["😂 <foo@bar.baz>"],
+                "blame": {"d1/f1.ftl": {"two": (0, self.timestamps[1])}},
+            },
+        )
+
+    def test_git_lines_stderr(self):
+        # More warnings than a pipe buffer holds don't block the output.
+        noisy = "!yes warning | head -c 200000 >&2; echo out"
+        lines = git_lines(self.root, "-c", f"alias.noisy={noisy}", "noisy")
+        self.assertEqual(list(lines), [b"out"])
+
+    def test_cat(self):
+        client = RepoClient(self.root)
+        self.assertEqual(
+            client.cat("d1/f1.ftl"), b"one = first line\ntwo = second line\n"
+        )
+        self.assertEqual(client.cat("d1/f1.ftl", "HEAD~1"), b"one = first line\n")
+        with self.assertRaises(FileNotFoundError):
+            client.cat("d1/f2.ftl")
+        with self.assertRaises(FileNotFoundError):
+            client.cat("d1")
+        self.assertEqual(client.cat("d1/f1.ftl", "HEAD~1"), b"one = first line\n")
+        self.assertEqual(client.files(), {"d1/f1.ftl"})
+        client.close()
+
+    def test_cat_subdirectory(self):
+        # The localization may be a subdirectory of the repository.
+        client = RepoClient(join(self.root, "d1"))
+        self.assertEqual(client.files("HEAD~1"), {"f1.ftl"})
+        self.assertEqual(client.cat("f1.ftl", "HEAD~1"), b"one = first line\n")
+        client.close()
+
+    def test_context_revision(self):
+        with open(join(self.root, "d1", "f1.ftl"), "w") as f:
+            f.write("uncommitted = line\n")
+        client = RepoClient(self.root)
+        ctx = MigrationContext(
+            "de",
+            self.root,
+            self.root,
+            localization_storage=RepoStorage(client, "HEAD~1"),
+        )
+        self.assertTrue(ctx.maybe_add_localization("d1/f1.ftl"))
+        self.assertFalse(ctx.maybe_add_localization("d1/f2.ftl"))
+        self.assertEqual(
+            ctx.get_fluent_source_pattern("d1/f1.ftl", "one").elements[0].value,
+            "first line",
+        )
+        client.close()
+
+    def test_blame_ranges(self):
+        client = RepoClient(self.root)
+        self.assertEqual(
+            client.blame("d1/f1.ftl", [(2, 2)]),
+            {1: ("😂 <foo@bar.baz>", self.timestamps[1])},
+        )
+
+    def test_blame_repeated_commit(self):
+        # The author of the first commit is only listed once, for line 1.
+        with open(join(self.root, "d1", "f1.ftl"), "a") as f:
+            f.write("three = third line\n")
+        with open(join(self.root, "d1", "f1.ftl")) as f:
+            content = f.read()
+        with open(join(self.root, "d1", "f1.ftl"), "w") as f:
+            f.write(content.replace("first line", "first\n  line"))
+        git(self.root, "commit", "--all", "--author=X <x@y.z>", "--message=Third")
+        client = RepoClient(self.root)
+        users = [user for user, _ in client.blame("d1/f1.ftl")]
+        self.assertEqual(
+            users,
+            [
+                "X <x@y.z>",
+                "X <x@y.z>",
+                "😂 <foo@bar.baz>",
+                "X <x@y.z>",
+            ],
+        )
+
+    def test_blame_cache(self):
+        cache_path = join(self.root, ".blame-cache.json")
+        client = RepoClient(self.root)
+        cache = BlameCache(cache_path)
+        self.assertEqual(cache.blame(client, "d1/f1.ftl"), client.blame("d1/f1.ftl"))
+        cache.save()
+
+        with open(join(self.root, "d1", "f1.ftl"), "w") as f:
+            f.write("zero = new line\none = first line\ntwo = changed\n")
+        git(self.root, "commit", "--all", "--author=X <x@y.z>", "--message=Third")
+        ranges = []
+        blame = client.blame
+
+        def blame_ranges(file, line_ranges=None, revision=None):
+            ranges.append(line_ranges)
+            return blame(file, line_ranges, revision)
+
+        client.blame = blame_ranges
+
+        cache = BlameCache(cache_path)
+        self.assertEqual(cache.blame(client, "d1/f1.ftl"), blame("d1/f1.ftl"))
+        self.assertEqual(ranges, [[(1, 1), (3, 3)]])
+        self.assertEqual(
+            [user for user, _ in cache.files["d1/f1.ftl"]["lines"]],
+            ["X <x@y.z>", "Hüsker Dü <husker@example.com>", "X <x@y.z>"],
+        )
+
+    def test_blame_cache_uncommitted(self):
+        cache_path = join(self.root, ".blame-cache.json")
+        path = join(self.root, "d1", "f1.ftl")
+        with open(path) as f:
+            committed = f.read()
+        with open(path, "w") as f:
+            f.write("zero = uncommitted\n" + committed)
+        client = RepoClient(self.root)
+        cache = BlameCache(cache_path)
+        self.assertEqual(
+            [user for user, _ in cache.blame(client, "d1/f1.ftl")],
+            [
+                "Not Committed Yet <not.committed.yet>",
+                "Hüsker Dü <husker@example.com>",
+                "😂 <foo@bar.baz>",
+            ],
+        )
+        cache.save()
+
+        # Once the change is reverted, the stored blame is still right.
+        with open(path, "w") as f:
+            f.write(committed)
+        cache = BlameCache(cache_path)
+        self.assertEqual(cache.blame(client, "d1/f1.ftl"), client.blame("d1/f1.ftl"))
@@ -1,6 +1,8 @@
 import unittest
 
-from fluent.migrate.changesets import convert_blame_to_changesets
+from fluent.migrate.blame import BlameColumns
+from fluent.migrate.changesets import activation_schedule, convert_blame_to_changesets
+from fluent.migrate.intern import SourceTable
 
 
 class TestBlameToChangesets(unittest.TestCase):
@@ -33,3 +35,58 @@ class TestBlameToChangesets(unittest.TestCase):
         ]
 
         self.assertEqual(convert_blame_to_changesets(blame), expected)
+
+    def test_columns(self):
+        blame = {
+            "authors": ["A", "B"],
+            "blame": {
+                "path/one": {"key1": (0, 1346095921.0), "key2": (1, 1218121409.0)},
+                "path/two": {"key1": (1, 1440596526.0), "key3": (0, 1346095921.0)},
+            },
+        }
+        columns = BlameColumns.from_json(blame)
+        self.assertEqual(len(columns), 4)
+        self.assertEqual(list(columns.author_ids), [0, 1, 1, 0])
+        self.assertEqual(columns.to_json(), blame)
+        self.assertEqual(
+            convert_blame_to_changesets(columns), convert_blame_to_changesets(blame)
+        )
+
+    def test_sources(self):
+        sources = SourceTable()
+        known = sources.add(("path/one", "key1"))
+        blame = {
+            "authors": ["A"],
+            "blame": {
+                "path/one": {"key1": [0, 1346095921.0], "key2": [0, 1218121409.0]},
+            },
+        }
+        (changeset,) = convert_blame_to_changesets(blame, sources)
+        self.assertEqual(
+            changeset["changes"], {("path/one", "key1"), ("path/one", "key2")}
+        )
+        (source,) = [change for change in changeset["changes"] if change[1] == "key1"]
+        self.assertIs(source, sources[known])
+        self.assertEqual(sources.to_ids(changeset["changes"]), {known})
+
+
+class TestActivationSchedule(unittest.TestCase):
+    def test_schedule(self):
+        changesets = [
+            {"author": "B", "first_commit": 1.0, "changes": {("a.dtd", "one")}},
+            {"author": "A", "first_commit": 2.0, "changes": {("a.dtd", "two")}},
+            {"author": "B", "first_commit": 3.0, "changes": {("b.dtd", "three")}},
+        ]
+        dependencies = {
+            ("one.ftl", "hardcoded"): set(),
+            ("one.ftl", "one"): {("a.dtd", "one")},
+            ("two.ftl", "one-two"): {("a.dtd", "one"), ("a.dtd", "two")},
+            ("two.ftl", "missing"): {("a.dtd", "one"), ("a.dtd", "missing")},
+        }
+        self.assertEqual(
+            activation_schedule(changesets, dependencies),
+            [{"one.ftl"}, {"two.ftl"}, set()],
+        )
+
+    def test_empty(self):
+        self.assertEqual(activation_schedule([], {("one.ftl", "one"): set()}), [])
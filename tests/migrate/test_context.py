@@ -9,6 +9,7 @@ from fluent.migrate.errors import (
 )
 from fluent.migrate.util import ftl, ftl_resource_to_json, to_json
 from fluent.migrate.context import MigrationContext
+from fluent.migrate.storage import MemoryStorage
 from fluent.migrate.transforms import CONCAT, COPY
 
 
@@ -43,6 +44,108 @@ class TestMigrationContext_AddTransforms(unittest.TestCase):
             self.ctx.in_changeset(set(), set(), "aboutDownloads.ftl", "about")
         )
 
+    def test_localization_read_once(self):
+        for ident, key in (("title", "aboutDownloads.title"), ("header", "header")):
+            self.ctx.add_transforms(
+                "aboutDownloads.ftl",
+                "aboutDownloads.ftl",
+                [
+                    FTL.Message(
+                        id=FTL.Identifier(ident),
+                        value=COPY("aboutDownloads.dtd", key),
+                    ),
+                ],
+            )
+        registry = self.ctx.localization_registry
+        self.assertEqual(registry.pending, {"aboutDownloads.dtd"})
+        reads = self.ctx.stats.counters.get("files_read", 0)
+        self.assertEqual(list(self.ctx.localization_resources), ["aboutDownloads.dtd"])
+        self.assertEqual(list(self.ctx.localization_resources), ["aboutDownloads.dtd"])
+        self.assertEqual(self.ctx.stats.counters["files_read"], reads + 1)
+
+    def test_prefetch(self):
+        self.ctx.add_transforms(
+            "aboutDownloads.ftl",
+            "aboutDownloads.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("title"),
+                    value=CONCAT(
+                        COPY("aboutDownloads.dtd", "aboutDownloads.title"),
+                        COPY("a.dtd", "title"),
+                        COPY("b.dtd", "title"),
+                    ),
+                ),
+                FTL.Message(
+                    id=FTL.Identifier("typo"),
+                    value=COPY("aboutDownloads.dtd", "aboutDownloads.header"),
+                ),
+            ],
+        )
+        self.assertEqual(self.ctx.reference_resources, {})
+        self.assertEqual(self.ctx.target_resources, {})
+
+        with self.assertLogs("migrate", logging.WARNING) as logs:
+            self.ctx.prefetch()
+        self.assertEqual(
+            logs.output,
+            [
+                "WARNING:migrate:Missing localization files: a.dtd, b.dtd",
+                'WARNING:migrate:Message "typo" was not found in aboutDownloads.ftl',
+            ],
+        )
+        self.assertEqual(list(self.ctx.reference_resources), ["aboutDownloads.ftl"])
+        self.assertEqual(list(self.ctx.target_resources), ["aboutDownloads.ftl"])
+        self.assertEqual(
+            list(self.ctx.localization_registry.resources), ["aboutDownloads.dtd"]
+        )
+
+    def test_dependency_masks(self):
+        self.ctx.add_transforms(
+            "aboutDownloads.ftl",
+            "aboutDownloads.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("title"),
+                    value=CONCAT(
+                        COPY("aboutDownloads.dtd", "aboutDownloads.title"),
+                        COPY("aboutDownloads.dtd", "aboutDownloads.header"),
+                    ),
+                ),
+                FTL.Message(
+                    id=FTL.Identifier("header"),
+                    value=COPY("aboutDownloads.dtd", "aboutDownloads.header"),
+                ),
+            ],
+        )
+        sources = self.ctx.sources
+        title = sources.get(("aboutDownloads.dtd", "aboutDownloads.title"))
+        header = sources.get(("aboutDownloads.dtd", "aboutDownloads.header"))
+        self.assertEqual(
+            self.ctx.dependency_masks,
+            {
+                ("aboutDownloads.ftl", "title"): 1 << title | 1 << header,
+                ("aboutDownloads.ftl", "header"): 1 << header,
+            },
+        )
+        (source,) = self.ctx.dependencies[("aboutDownloads.ftl", "header")]
+        self.assertIs(source, sources[header])
+        self.assertTrue(
+            self.ctx.in_changeset_mask(
+                1 << header, 1 << header, "aboutDownloads.ftl", "header"
+            )
+        )
+        self.assertFalse(
+            self.ctx.in_changeset_mask(
+                1 << header, 1 << header, "aboutDownloads.ftl", "title"
+            )
+        )
+        self.assertTrue(
+            self.ctx.in_changeset_mask(
+                1 << header, 1 << title | 1 << header, "aboutDownloads.ftl", "title"
+            )
+        )
+
     def test_no_reference(self):
         self.ctx.reference_dir = None
         self.ctx.add_transforms(
@@ -278,6 +381,24 @@ class TestMigrationContext(unittest.TestCase):
             serialized = self.ctx.serialize_changeset(changeset)
             self.assertEqual(serialized, next(expected))
 
+    def test_serialize_changeset_paths(self):
+        self.ctx.add_transforms(
+            "aboutDownloads.ftl",
+            "aboutDownloads.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("title"),
+                    value=COPY("aboutDownloads.dtd", "aboutDownloads.title"),
+                ),
+            ],
+        )
+        changeset = {("aboutDownloads.dtd", "aboutDownloads.title")}
+        self.assertEqual(self.ctx.serialize_changeset(changeset, paths=[]), {})
+        self.assertEqual(
+            list(self.ctx.serialize_changeset(changeset, paths=["aboutDownloads.ftl"])),
+            ["aboutDownloads.ftl"],
+        )
+
     def test_fluent_source(self):
         self.ctx.maybe_add_localization("existing.ftl")
         bar = self.ctx.get_fluent_source_pattern("existing.ftl", "bar")
@@ -729,6 +850,56 @@ class TestExistingTarget(unittest.TestCase):
         # is an empty iterator.
         self.assertDictEqual(to_json(self.ctx.merge_changeset()), {})
 
+    def test_existing_target_parsed_on_demand(self):
+        self.ctx.add_transforms(
+            "privacy.ftl",
+            "privacy.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("dnt-always"),
+                    value=COPY("privacy.dtd", "doNotTrack.always.label"),
+                ),
+            ],
+        )
+        self.ctx.prefetch()
+        scanned = self.ctx.target_resources["privacy.ftl"]
+        changeset = {("privacy.dtd", "doNotTrack.always.label")}
+        self.assertEqual(set(self.ctx.serialize_changeset(changeset)), {"privacy.ftl"})
+        # Only the looked up entries were parsed, not the whole file.
+        self.assertEqual(
+            [entry.id.name for entry in scanned.parsed_entries()],
+            ["dnt-description"],
+        )
+
+    def test_existing_target_junk(self):
+        logging.disable(logging.NOTSET)
+        ctx = MigrationContext(
+            "pl",
+            "reference",
+            "localization",
+            reference_storage=MemoryStorage(
+                {"a.ftl": b"foo = Foo\nbroken = Broken\n"}
+            ),
+            localization_storage=MemoryStorage(
+                {"a.dtd": b'<!ENTITY foo "Foo">\n', "a.ftl": b"broken =\n"}
+            ),
+        )
+        ctx.add_transforms(
+            "a.ftl",
+            "a.ftl",
+            [FTL.Message(id=FTL.Identifier("foo"), value=COPY("a.dtd", "foo"))],
+        )
+        with self.assertLogs("migrate", logging.WARNING) as logs:
+            serialized = ctx.serialize_changeset({("a.dtd", "foo")})
+        self.assertEqual(
+            logs.output,
+            [
+                "WARNING:migrate:Syntax error in a.ftl: "
+                'Expected message "broken" to have a value or attributes'
+            ],
+        )
+        self.assertEqual(serialized, {"a.ftl": "foo = Foo\n"})
+
 
 class TestMessagesEqual(unittest.TestCase):
     maxDiff = None
@@ -853,3 +1024,151 @@ class TestMessagesEqual(unittest.TestCase):
             ]
         )
         self.assertFalse(self.ctx.messages_equal(first, second))
+
+
+class TestPreserveFormatting(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        # Silence all logging.
+        logging.disable(logging.CRITICAL)
+
+        self.ctx = MigrationContext(
+            locale="pl",
+            reference_dir=here("fixtures/en-US"),
+            localization_dir=here("fixtures/pl"),
+            preserve_formatting=True,
+        )
+
+    def tearDown(self):
+        # Resume logging.
+        logging.disable(logging.NOTSET)
+
+    def test_splice_changesets(self):
+        self.ctx.add_transforms(
+            "privacy.ftl",
+            "privacy.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("dnt-learn-more"),
+                    value=COPY("privacy.dtd", "doNotTrack.learnMore.label"),
+                ),
+                FTL.Message(
+                    id=FTL.Identifier("dnt-always"),
+                    value=COPY("privacy.dtd", "doNotTrack.always.label"),
+                ),
+            ],
+        )
+
+        license = ftl(
+            """
+        # This Source Code Form is subject to the terms of the Mozilla Public
+        # License, v. 2.0. If a copy of the MPL was not distributed with this
+        # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+        """
+        )
+        changesets = [
+            {("privacy.dtd", "doNotTrack.always.label")},
+            {("privacy.dtd", "doNotTrack.learnMore.label")},
+        ]
+        expected = [
+            {
+                "privacy.ftl": license
+                + ftl(
+                    """
+        dnt-description = New Description in Polish
+        dnt-always = Zawsze
+                """
+                )
+            },
+            {
+                "privacy.ftl": license
+                + ftl(
+                    """
+        dnt-description = New Description in Polish
+        dnt-learn-more = Więcej informacji
+        dnt-always = Zawsze
+                """
+                )
+            },
+        ]
+
+        for changeset, snapshot in zip(changesets, expected):
+            self.assertEqual(self.ctx.serialize_changeset(changeset), snapshot)
+
+    def test_splice_parsed_on_demand(self):
+        self.ctx.add_transforms(
+            "privacy.ftl",
+            "privacy.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("dnt-always"),
+                    value=COPY("privacy.dtd", "doNotTrack.always.label"),
+                ),
+            ],
+        )
+        self.ctx.prefetch()
+        scanned = self.ctx.target_resources["privacy.ftl"]
+        changeset = {("privacy.dtd", "doNotTrack.always.label")}
+        self.assertEqual(set(self.ctx.serialize_changeset(changeset)), {"privacy.ftl"})
+        # Only the looked up entries were parsed, not the whole file.
+        self.assertEqual(
+            [entry.id.name for entry in scanned.parsed_entries()],
+            ["dnt-description"],
+        )
+
+    def test_drop_obsolete(self):
+        # Like without preserve_formatting, messages which aren't in the
+        # reference are dropped.
+        ctx = MigrationContext(
+            "pl",
+            "reference",
+            "localization",
+            preserve_formatting=True,
+            reference_storage=MemoryStorage({"f.ftl": b"one = One\ntwo = Two\n"}),
+            localization_storage=MemoryStorage(
+                {
+                    "f.dtd": b'<!ENTITY two "Dwa">\n',
+                    "f.ftl": b"one = Jeden\nobsolete = Old\n",
+                }
+            ),
+        )
+        ctx.add_transforms(
+            "f.ftl",
+            "f.ftl",
+            [FTL.Message(id=FTL.Identifier("two"), value=COPY("f.dtd", "two"))],
+        )
+        self.assertEqual(
+            ctx.serialize_changeset({("f.dtd", "two")}),
+            {"f.ftl": "one = Jeden\ntwo = Dwa\n"},
+        )
+
+    def test_new_file(self):
+        self.ctx.add_transforms(
+            "aboutDownloads.ftl",
+            "aboutDownloads.ftl",
+            [
+                FTL.Message(
+                    id=FTL.Identifier("title"),
+                    value=COPY("aboutDownloads.dtd", "aboutDownloads.title"),
+                ),
+            ],
+        )
+
+        self.assertEqual(
+            self.ctx.serialize_changeset(
+                {("aboutDownloads.dtd", "aboutDownloads.title")}
+            ),
+            {
+                "aboutDownloads.ftl": ftl(
+                    """
+        # This Source Code Form is subject to the terms of the Mozilla Public
+        # License, v. 2.0. If a copy of the MPL was not distributed with this
+        # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+        title = Pobrane pliki
+                """
+                )
+            },
+        )
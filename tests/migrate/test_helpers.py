@@ -391,3 +391,21 @@ class TestMessageReference(unittest.TestCase):
                 )
             )
         )
+
+
+class TestTransformsFromCache(unittest.TestCase):
+    def test_clones(self):
+        ftl = 'cached-key = { COPY(file_dtd, "key") }'
+        first = transforms_from(ftl, file_dtd="very/long/path/to/a/file.dtd")
+        second = transforms_from(ftl, file_dtd="very/long/path/to/a/file.dtd")
+        self.assertTrue(first[0].equals(second[0]))
+        self.assertIsNot(first[0], second[0])
+        self.assertIsNot(first[0].value, second[0].value)
+        other = transforms_from(ftl, file_dtd="other.dtd")
+        self.assertEqual(other[0].value.elements[0].path, "other.dtd")
+
+    def test_errors_not_cached(self):
+        ftl = 'cached-key = { COPY(file_dtd, "key") }'
+        for _ in range(2):
+            with self.assertRaises(InvalidTransformError):
+                transforms_from(ftl)
@@ -0,0 +1,34 @@
+import unittest
+
+from fluent.migrate.intern import SourceTable, to_mask
+
+
+class TestSourceTable(unittest.TestCase):
+    def test_ids(self):
+        sources = SourceTable()
+        self.assertEqual(sources.add(("file.dtd", "one")), 0)
+        self.assertEqual(sources.add(("file.dtd", "two")), 1)
+        self.assertEqual(sources.add(("file.dtd", "one")), 0)
+        self.assertEqual(sources.add(("file.po", ("msgid", None))), 2)
+        self.assertEqual(len(sources), 3)
+        self.assertEqual(sources[1], ("file.dtd", "two"))
+        self.assertEqual(sources.get(("file.dtd", "two")), 1)
+        self.assertIsNone(sources.get(("file.dtd", "three")))
+        self.assertEqual(
+            sources.to_ids([("file.dtd", "two"), ("file.dtd", "three")]),
+            frozenset([1]),
+        )
+        self.assertEqual(
+            sources.mask([("file.dtd", "two"), ("file.po", ("msgid", None))]),
+            0b110,
+        )
+        self.assertEqual(sources.mask([("file.dtd", "three")]), 0)
+        self.assertEqual(to_mask([0, 2]), 0b101)
+
+    def test_strings(self):
+        sources = SourceTable()
+        path = "".join(["file", ".dtd"])
+        sources.add((path, "one"))
+        other = sources.source("".join(["file", ".dtd"]), "two")
+        self.assertIs(other[0], path)
+        self.assertIs(sources.source("file.dtd", "one"), sources[0])
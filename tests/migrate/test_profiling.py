@@ -0,0 +1,51 @@
+from contextlib import redirect_stdout
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+from fluent.migrate.profiling import Profiler
+
+
+def work():
+    return [str(i) for i in range(1000)]
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_cpu(self):
+        profiler = Profiler("cpu", os.path.join(self.root, "profiles"), top=5)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            with profiler.profile("tests.migrate.some-sr@latin"):
+                work()
+        path = os.path.join(self.root, "profiles", "tests.migrate.some-sr_latin.prof")
+        self.assertIn(f"CPU profile written to {path}", out.getvalue())
+        stats = pstats.Stats(path)
+        self.assertTrue(
+            any(func[2] == "work" for func in stats.stats),
+        )
+
+    def test_memory(self):
+        profiler = Profiler("memory", self.root, top=3)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            with profiler.profile("some-de"):
+                work()
+        path = os.path.join(self.root, "some-de.tracemalloc")
+        self.assertIn(f"Memory profile written to {path}", out.getvalue())
+        self.assertIn("Peak traced memory", out.getvalue())
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIsInstance(tracemalloc.Snapshot.load(path), tracemalloc.Snapshot)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            Profiler("disk")
@@ -0,0 +1,318 @@
+import logging
+import os
+import unittest
+
+import fluent.syntax.ast as FTL
+from fluent.syntax.parser import FluentParser
+from fluent.syntax.serializer import FluentSerializer
+
+from fluent.migrate.blame import Blame
+from fluent.migrate.resources import (
+    FluentSourceResource,
+    LegacyResource,
+    ScannedResource,
+    scan_fluent,
+    splice_resource,
+)
+from fluent.migrate.util import ftl, ftl_resource_to_ast, get_message
+
+
+def here(*parts):
+    dirname = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(dirname, *parts)
+
+
+class TestLegacyResource(unittest.TestCase):
+    def test_dtd(self):
+        resource = LegacyResource.from_bytes(
+            "file.dtd",
+            b"""\
+<!ENTITY one "First &amp; only">
+<!ENTITY two "Zwei">
+""",
+        )
+        self.assertEqual(len(resource), 2)
+        self.assertIn("one", resource)
+        self.assertEqual(resource.get("one"), "First & only")
+        self.assertIsNone(resource.get("three"))
+        self.assertEqual(dict(resource), {"one": "First & only", "two": "Zwei"})
+
+    def test_values_are_lazy(self):
+        resource = LegacyResource.from_bytes(
+            "file.properties", b"one = First\ntwo = Second\n"
+        )
+        self.assertEqual(resource._values, {})
+        self.assertEqual(resource["two"], "Second")
+        self.assertEqual(resource._values, {"two": "Second"})
+
+    def test_line_endings(self):
+        resource = LegacyResource.from_bytes(
+            "file.properties", b"one = First\r\ntwo = Sec\\\r\n  ond\r\n"
+        )
+        self.assertEqual(dict(resource), {"one": "First", "two": "Second"})
+
+    def test_empty(self):
+        resource = LegacyResource.from_bytes("file.properties", b"")
+        self.assertEqual(len(resource), 0)
+
+    def test_junk(self):
+        resource = LegacyResource.from_bytes(
+            "file.dtd",
+            b"""\
+<!ENTITY one "First">
+junk
+<!ENTITY two "Second">
+""",
+        )
+        self.assertEqual(list(resource), ["one", "two"])
+
+    def test_line_spans(self):
+        resource = LegacyResource.from_bytes(
+            "file.properties", b"one = First\ntwo = Sec\\\n  ond\nthree = Third\n"
+        )
+        self.assertEqual(
+            list(resource.line_spans()), [("one", 1, 1), ("two", 2, 3), ("three", 4, 4)]
+        )
+
+
+class TestFluentSourceResource(unittest.TestCase):
+    source = """\
+# Comment
+one = First
+    .attr =
+        Multi
+        line
+-term = Term
+no-value =
+    .attr = Attribute
+"""
+
+    def test_line_spans(self):
+        resource = FluentSourceResource(
+            self.source, FluentParser(with_spans=True).parse(self.source)
+        )
+        expected = [
+            ("one", 2, 2),
+            ("one.attr", 4, 5),
+            ("-term", 6, 6),
+            ("no-value.attr", 8, 8),
+        ]
+        self.assertEqual(list(resource.line_spans()), expected)
+
+        # The same lines as compare-locales finds.
+        blame = Blame(None)
+        blame.readFile = lambda parser, path: parser.readUnicode(self.source)
+        file_blame = [(f"user{line}", line) for line in range(1, 10)]
+        blame.handleFile("file.ftl", file_blame)
+        blame.handleLines("other.ftl", resource.line_spans(), file_blame)
+        self.assertEqual(blame.blame["file.ftl"], blame.blame["other.ftl"])
+
+    def test_no_spans(self):
+        resource = FluentSourceResource(
+            self.source, FluentParser(with_spans=True).parse(self.source)
+        )
+        self.assertEqual(
+            resource.resource.to_json(),
+            FluentParser(with_spans=False).parse(self.source).to_json(),
+        )
+
+
+class TestScanFluent(unittest.TestCase):
+    def test_entries(self):
+        source = ftl(
+            """
+            ### Resource comment
+
+            # Attached comment
+            # on two lines
+            foo = Foo
+                .attr = Attribute
+
+            # Standalone comment
+
+            -term = Term
+            bar =
+                { $num ->
+            [one] One
+               *[other] Other
+                }
+            junk
+            """
+        )
+        entries = scan_fluent(source)
+        self.assertEqual(
+            [entry.id for entry in entries], [None, "foo", None, "term", "bar", None]
+        )
+        self.assertEqual(
+            source[entries[1].start : entries[1].end],
+            "# Attached comment\n"
+            "# on two lines\n"
+            "foo = Foo\n"
+            "    .attr = Attribute\n"
+            "\n",
+        )
+        self.assertTrue(source[entries[-2].start :].startswith("bar ="))
+
+    def test_group_comment_not_attached(self):
+        entries = scan_fluent("## Group\nfoo = Foo\n")
+        self.assertEqual([entry.id for entry in entries], [None, "foo"])
+
+    def test_fixtures(self):
+        for name in os.listdir(here("fixtures", "en-US")):
+            with open(here("fixtures", "en-US", name)) as f:
+                source = f.read()
+            resource = FluentParser(with_spans=False).parse(source)
+            self.assertEqual(
+                [entry.id for entry in scan_fluent(source) if entry.id],
+                [
+                    entry.id.name
+                    for entry in resource.body
+                    if isinstance(entry, (FTL.Message, FTL.Term))
+                ],
+            )
+
+
+class TestScannedResource(unittest.TestCase):
+    def setUp(self):
+        self.resource = ScannedResource(
+            "file.ftl",
+            ftl(
+                """
+            # Comment
+            foo = Foo
+            broken = { $x
+            bar = Bar
+            """
+            ),
+            FluentParser(with_spans=False),
+        )
+
+    def test_get_entry(self):
+        foo = self.resource.get_entry("foo")
+        self.assertIsInstance(foo, FTL.Message)
+        self.assertEqual(foo.comment.content, "Comment")
+        with self.assertLogs("migrate", logging.WARNING) as logs:
+            self.assertIsNone(self.resource.get_entry("broken"))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Syntax error in file.ftl", logs.output[0])
+        self.assertIsNone(self.resource.get_entry("missing"))
+        self.assertEqual(
+            [entry.id.name for entry in self.resource.parsed_entries()], ["foo"]
+        )
+
+    def test_junk(self):
+        # Scanned entries without an identifier are parsed right away.
+        with self.assertLogs("migrate", logging.WARNING) as logs:
+            resource = ScannedResource(
+                "file.ftl", "foo = Foo\njunk\n", FluentParser(with_spans=False)
+            )
+        self.assertEqual(
+            logs.output,
+            ['WARNING:migrate:Syntax error in file.ftl: Expected token: "="'],
+        )
+        self.assertEqual(resource.parsed_entries(), [])
+
+    def test_merges_unchanged(self):
+        reference = ftl_resource_to_ast(
+            """
+            foo = Foo
+            broken = Broken
+            bar = Bar
+            """
+        )
+        transforms = [
+            FTL.Message(FTL.Identifier("foo"), value=FTL.Pattern([])),
+            FTL.Message(FTL.Identifier("broken"), value=FTL.Pattern([])),
+        ]
+        self.assertTrue(
+            self.resource.merges_unchanged(
+                reference, transforms, lambda ident: ident == "foo"
+            )
+        )
+        self.assertFalse(
+            self.resource.merges_unchanged(
+                reference, transforms, lambda ident: ident == "broken"
+            )
+        )
+        reference.body.pop()
+        self.assertFalse(
+            self.resource.merges_unchanged(reference, transforms, lambda ident: False)
+        )
+
+
+class TestSpliceResource(unittest.TestCase):
+    def splice(self, source, new_entries):
+        parser = FluentParser(with_spans=False)
+        scanned = ScannedResource("file.ftl", source, parser)
+        existing = parser.parse(source)
+        snapshot = FTL.Resource(
+            [
+                new_entries.pop(0) if entry is None else entry
+                for entry in [
+                    get_message(existing.body, ident) if ident else None
+                    for ident in self.order
+                ]
+            ]
+        )
+        return splice_resource(scanned, snapshot, existing, FluentSerializer())
+
+    def message(self, ident):
+        return FTL.Message(
+            FTL.Identifier(ident), value=FTL.Pattern([FTL.TextElement(ident)])
+        )
+
+    def test_keep_formatting(self):
+        self.order = ["foo", None, "bar"]
+        self.assertEqual(
+            self.splice("foo =\n  Foo\n\n\nbar    = Bar\n", [self.message("new")]),
+            "foo =\n  Foo\nnew = new\n\n\nbar    = Bar\n",
+        )
+
+    def test_cut_dropped(self):
+        # Obsolete messages and Junk aren't in the snapshot.
+        self.order = ["foo", None, "bar"]
+        self.assertEqual(
+            self.splice(
+                "# Comment\nfoo = Foo\n\nobsolete = Old\njunk\nbar = Bar\n",
+                [self.message("new")],
+            ),
+            "# Comment\nfoo = Foo\nnew = new\n\nbar = Bar\n",
+        )
+
+    def test_before_first(self):
+        self.order = [None, None, "foo"]
+        self.assertEqual(
+            self.splice(
+                "# Comment\n\nfoo = Foo\n",
+                [self.message("one"), self.message("two")],
+            ),
+            "# Comment\n\none = one\ntwo = two\nfoo = Foo\n",
+        )
+
+    def test_after_comment(self):
+        # Appended messages aren't attached to a trailing comment.
+        self.order = [None, None]
+        self.assertEqual(
+            self.splice("# just comment\n", [self.message("a"), self.message("b")]),
+            "# just comment\n\na = a\nb = b\n",
+        )
+        self.order = [None]
+        self.assertEqual(
+            self.splice("# just comment\n\n", [self.message("a")]),
+            "# just comment\n\na = a\n",
+        )
+        self.assertEqual(self.splice("", [self.message("a")]), "a = a\n")
+
+    def test_missing_newline(self):
+        self.order = ["foo", None]
+        self.assertEqual(
+            self.splice("foo = Foo", [self.message("new")]),
+            "foo = Foo\nnew = new\n",
+        )
+
+    def test_crlf(self):
+        self.order = ["foo", None]
+        self.assertEqual(
+            self.splice("foo = Foo\r\n\r\n", [self.message("new")]),
+            "foo = Foo\r\nnew = new\r\n\r\n",
+        )
@@ -0,0 +1,126 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+import unittest
+
+import fluent.syntax.ast as FTL
+from fluent.syntax.parser import FluentParser
+
+from fluent.migrate.context import MigrationContext
+from fluent.migrate.helpers import transforms_from
+from fluent.migrate.shared import SharedReferences
+from fluent.migrate.storage import FileSystemStorage, MemoryStorage
+
+
+def here(*parts):
+    dirname = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(dirname, *parts)
+
+
+def worker_ids(name, path):
+    shared = SharedReferences.attach(name)
+    try:
+        return [
+            entry.id.name
+            for entry in shared.resource(path, ()).body
+            if isinstance(entry, (FTL.Message, FTL.Term))
+        ]
+    finally:
+        shared.close()
+
+
+class TestSharedReferences(unittest.TestCase):
+    def setUp(self):
+        # Silence the warning about the missing file.
+        logging.disable(logging.CRITICAL)
+        self.shared = SharedReferences.create(
+            FileSystemStorage(here("fixtures/en-US")),
+            ["aboutDownloads.ftl", "bilingual.ftl", "missing.ftl"],
+        )
+
+    def tearDown(self):
+        self.shared.unlink()
+        logging.disable(logging.NOTSET)
+
+    def parse(self, path):
+        with open(here("fixtures/en-US", path), encoding="utf-8") as f:
+            return FluentParser(with_spans=False).parse(f.read())
+
+    def test_files(self):
+        self.assertIn("aboutDownloads.ftl", self.shared)
+        self.assertIn("bilingual.ftl", self.shared)
+        self.assertNotIn("missing.ftl", self.shared)
+
+    def test_resource(self):
+        for path in ("aboutDownloads.ftl", "bilingual.ftl"):
+            self.assertTrue(
+                self.shared.resource(path).equals(self.parse(path)),
+            )
+
+    def test_storage(self):
+        storage = MemoryStorage(
+            {"a.ftl": b"a = A\n", "broken.ftl": b"\xff"},
+        )
+        shared = SharedReferences.create(storage, ["a.ftl", "broken.ftl"])
+        try:
+            self.assertIn("a.ftl", shared)
+            self.assertNotIn("broken.ftl", shared)
+            self.assertEqual(
+                [entry.id.name for entry in shared.resource("a.ftl").body], ["a"]
+            )
+        finally:
+            shared.unlink()
+
+    def test_partial(self):
+        expected = self.parse("aboutDownloads.ftl")
+        resource = self.shared.resource("aboutDownloads.ftl", {"title"})
+        self.assertEqual(len(resource.body), len(expected.body))
+        for entry, expected_entry in zip(resource.body, expected.body):
+            self.assertIs(type(entry), type(expected_entry))
+            if not isinstance(entry, (FTL.Message, FTL.Term)):
+                self.assertTrue(entry.equals(expected_entry))
+            elif entry.id.name == "title":
+                self.assertTrue(entry.equals(expected_entry))
+            else:
+                self.assertEqual(entry.id.name, expected_entry.id.name)
+                self.assertIsNone(entry.value)
+
+    def test_attach(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            ids = executor.submit(
+                worker_ids, self.shared.name, "aboutDownloads.ftl"
+            ).result()
+        self.assertEqual(
+            ids,
+            [
+                entry.id.name
+                for entry in self.parse("aboutDownloads.ftl").body
+                if isinstance(entry, FTL.Message)
+            ],
+        )
+
+    def test_context(self):
+        def migrate(ctx):
+            ctx.add_transforms(
+                "aboutDownloads.ftl",
+                "aboutDownloads.ftl",
+                transforms_from(
+                    """
+title = { COPY("aboutDownloads.dtd", "aboutDownloads.title") }
+header = { COPY("aboutDownloads.dtd", "aboutDownloads.header") }
+"""
+                ),
+            )
+
+        expected = MigrationContext("pl", here("fixtures/en-US"), here("fixtures/pl"))
+        migrate(expected)
+        ctx = MigrationContext(
+            "pl",
+            here("fixtures/en-US"),
+            here("fixtures/pl"),
+            shared_references=self.shared,
+        )
+        migrate(ctx)
+        self.assertEqual(
+            ctx.serialize_changeset(None), expected.serialize_changeset(None)
+        )
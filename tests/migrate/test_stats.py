@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from fluent.migrate.stats import Stats, format_reports
+
+
+class TestStats(unittest.TestCase):
+    def test_stats(self):
+        stats = Stats()
+        with stats.phase("merge"):
+            pass
+        with stats.phase("merge"):
+            pass
+        stats.count("commits")
+        stats.count("bytes_written", 42)
+        stats.count("commits")
+        report = stats.report("migration", "de")
+        self.assertEqual(report["migration"], "migration")
+        self.assertEqual(report["locale"], "de")
+        self.assertEqual(list(report["phases"]), ["merge"])
+        self.assertGreaterEqual(report["phases"]["merge"], 0)
+        self.assertEqual(report["counters"], {"commits": 2, "bytes_written": 42})
+
+    def test_phase_exception(self):
+        stats = Stats()
+        with self.assertRaises(ValueError):
+            with stats.phase("recipe"):
+                raise ValueError
+        self.assertIn("recipe", stats.phases)
+
+    def test_format(self):
+        reports = [
+            {
+                "migration": "migration",
+                "locale": "de",
+                "phases": {"blame": 1.5},
+                "counters": {"commits": 3},
+            }
+        ]
+        self.assertEqual(json.loads(format_reports(reports, "json")), reports)
+        self.assertEqual(
+            format_reports(reports, "text"),
+            "migration for de:\n  blame: 1.500s\n  commits: 3",
+        )
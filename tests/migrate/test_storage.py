@@ -0,0 +1,104 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import fluent.syntax.ast as FTL
+
+from fluent.migrate.context import MigrationContext
+from fluent.migrate.storage import (
+    ArchiveStorage,
+    FileSystemStorage,
+    MemoryStorage,
+    open_storage,
+)
+from fluent.migrate.transforms import COPY
+
+
+class TestArchiveStorage(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_zip(self):
+        path = os.path.join(self.root, "de.zip")
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("de/d1/f1.dtd", b'<!ENTITY one "Eins">\n')
+            archive.writestr("other.txt", b"")
+        storage = open_storage(path)
+        self.assertIsInstance(storage, ArchiveStorage)
+        self.assertTrue(storage.exists("de/d1/f1.dtd"))
+        storage.close()
+
+        storage = ArchiveStorage(path, "de")
+        self.assertTrue(storage.exists("d1/f1.dtd"))
+        self.assertFalse(storage.exists("other.txt"))
+        self.assertEqual(storage.read("d1/f1.dtd"), b'<!ENTITY one "Eins">\n')
+        with self.assertRaises(FileNotFoundError):
+            storage.read("d1/f2.dtd")
+        with self.assertRaises(OSError):
+            storage.write("d1/f1.ftl", b"")
+        storage.close()
+
+    def test_tar(self):
+        path = os.path.join(self.root, "de.tar.gz")
+        with tarfile.open(path, "w:gz") as archive:
+            info = tarfile.TarInfo("./d1/f1.ftl")
+            info.size = 10
+            archive.addfile(info, io.BytesIO(b"one = Eins"))
+        storage = ArchiveStorage(path)
+        self.assertEqual(storage.read("d1/f1.ftl"), b"one = Eins")
+        self.assertEqual(storage.location("d1/f1.ftl"), f"{path}:d1/f1.ftl")
+        storage.close()
+
+
+class TestMemoryStorage(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "d1"))
+        with open(os.path.join(self.root, "d1", "f1.ftl"), "wb") as f:
+            f.write(b"one = Eins\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_overlay(self):
+        base = FileSystemStorage(self.root)
+        storage = MemoryStorage(base=base)
+        self.assertTrue(storage.exists("d1/f1.ftl"))
+        self.assertFalse(storage.exists("d1/f2.ftl"))
+        location = os.path.join(self.root, "d1", "f1.ftl")
+        self.assertEqual(storage.location("d1/f1.ftl"), location)
+        storage.write("d1/f1.ftl", b"one = Uno\n")
+        self.assertEqual(storage.location("d1/f1.ftl"), location)
+        storage.write("d1/f2.ftl", b"two = Dos\n")
+        self.assertEqual(storage.read("d1/f1.ftl"), b"one = Uno\n")
+        self.assertEqual(storage.read("d1/f2.ftl"), b"two = Dos\n")
+        self.assertEqual(base.read("d1/f1.ftl"), b"one = Eins\n")
+        self.assertFalse(base.exists("d1/f2.ftl"))
+        with self.assertRaises(FileNotFoundError):
+            base.read("d1/f2.ftl")
+
+    def test_context(self):
+        ctx = MigrationContext(
+            "de",
+            "reference",
+            "localization",
+            reference_storage=MemoryStorage({"f1.ftl": b"one = One\n"}),
+            localization_storage=MemoryStorage(
+                {"f1.dtd": b'<!ENTITY one "Eins">\n'}
+            ),
+        )
+        ctx.add_transforms(
+            "f1.ftl",
+            "f1.ftl",
+            [FTL.Message(id=FTL.Identifier("one"), value=COPY("f1.dtd", "one"))],
+        )
+        self.assertEqual(
+            ctx.serialize_changeset({("f1.dtd", "one")}), {"f1.ftl": "one = Eins\n"}
+        )
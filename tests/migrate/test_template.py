@@ -0,0 +1,87 @@
+import os
+import types
+import unittest
+
+import fluent.syntax.ast as FTL
+from fluent.migrate.context import MigrationContext
+from fluent.migrate.helpers import VARIABLE_REFERENCE, transforms_from
+from fluent.migrate.template import RecipeTemplate, TemplateCache
+from fluent.migrate.transforms import PLURALS, REPLACE_IN_TEXT
+
+
+def here(*parts):
+    dirname = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(dirname, *parts)
+
+
+def make_recipe(calls, read_locale=False):
+    def migrate(ctx):
+        calls.append(ctx.locale if read_locale else None)
+        ctx.add_transforms(
+            "aboutDownloads.ftl",
+            "aboutDownloads.ftl",
+            transforms_from(
+                """
+title = { COPY("aboutDownloads.dtd", "aboutDownloads.title") }
+"""
+            )
+            + [
+                FTL.Message(
+                    id=FTL.Identifier("delete-all-message"),
+                    value=PLURALS(
+                        "aboutDownloads.properties",
+                        "downloadMessage.deleteAll",
+                        VARIABLE_REFERENCE("num"),
+                        lambda text: REPLACE_IN_TEXT(
+                            text, {"#1": VARIABLE_REFERENCE("num")}
+                        ),
+                    ),
+                ),
+            ],
+        )
+
+    return types.SimpleNamespace(__name__="bug_1_template", migrate=migrate)
+
+
+class TestRecipeTemplate(unittest.TestCase):
+    def context(self, locale):
+        return MigrationContext(
+            locale,
+            reference_dir=here("fixtures/en-US"),
+            localization_dir=here("fixtures/pl"),
+        )
+
+    def test_bind(self):
+        calls = []
+        recipe = make_recipe(calls)
+        template = RecipeTemplate.record(recipe, "pl")
+        self.assertIsNone(template.locale)
+
+        for locale in ("pl", "en", "pl"):
+            expected = self.context(locale)
+            recipe.migrate(expected)
+            ctx = self.context(locale)
+            template.bind(ctx)
+            self.assertEqual(ctx.dependencies, expected.dependencies)
+            self.assertEqual(
+                ctx.serialize_changeset(None), expected.serialize_changeset(None)
+            )
+        # Recorded once, and run for each expected context.
+        self.assertEqual(len(calls), 4)
+
+    def test_cache(self):
+        calls = []
+        recipe = make_recipe(calls)
+        cache = TemplateCache()
+        for locale in ("pl", "en", "de"):
+            cache.bind(recipe, self.context(locale))
+        self.assertEqual(calls, [None])
+
+    def test_cache_locale(self):
+        calls = []
+        recipe = make_recipe(calls, read_locale=True)
+        cache = TemplateCache()
+        for locale in ("pl", "en", "pl"):
+            cache.bind(recipe, self.context(locale))
+        self.assertEqual(calls, ["pl", "en"])
+        self.assertEqual(cache.get(recipe, "en").locale, "en")
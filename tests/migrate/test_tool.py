@@ -1,11 +1,19 @@
 import unittest
+from contextlib import redirect_stderr, redirect_stdout
+import io
+import json
 import os
 from os.path import join, relpath
 import shutil
+import sys
 import tempfile
+import zipfile
+from unittest import mock
 
+from fluent.migrate.blame import read_blame_file
+from fluent.migrate.helpers import transforms_from
 from fluent.migrate.repo_client import git
-from fluent.migrate.tool import Migrator
+from fluent.migrate.tool import Migrator, cli, main
 import hglib
 
 
@@ -139,3 +147,236 @@ class TestGitCommit(unittest.TestCase):
             self.migrator.client.root, "show", "--no-patch", "--pretty=format:%an:%s"
         )
         self.assertEqual(stdout, "Axel:Git commit message docstring, part 2.")
+
+
+class MockMigrationModule:
+    __name__ = "tests.migrate.some"
+
+    @staticmethod
+    def migrate(ctx):
+        """No bug - test conversions, part {index}."""
+        ctx.add_transforms(
+            "d1/f1.ftl",
+            "d1/f1.ftl",
+            transforms_from(
+                """\
+one = { COPY("d1/f1.dtd", "one") }
+two = { COPY("d1/f1.dtd", "two") }
+"""
+            ),
+        )
+
+
+class TestGitRun(unittest.TestCase):
+    def setUp(self):
+        self.root = root = tempfile.mkdtemp()
+        os.makedirs(join(root, "ref", "d1"))
+        with open(join(root, "ref", "d1", "f1.ftl"), "w") as f:
+            f.write("one = First\ntwo = Second\nthree = Third\n")
+
+        self.localization_dir = loc_dir = join(root, "localization")
+        os.makedirs(join(loc_dir, "d1"))
+        git(loc_dir, "init")
+        git(loc_dir, "config", "user.name", "Anon")
+        git(loc_dir, "config", "user.email", "anon@example.com")
+        for key, author in (("one", "Jane"), ("two", "Joe")):
+            with open(join(loc_dir, "d1", "f1.dtd"), "a") as f:
+                f.write(f'<!ENTITY {key} "{key.upper()}">\n')
+            git(loc_dir, "add", ".")
+            git(
+                loc_dir,
+                "commit",
+                f"--author={author} <{author.lower()}@example.com>",
+                f"--message=Add {key}",
+            )
+
+        self.reports = []
+        self.migrator = Migrator(
+            "de",
+            join(root, "ref"),
+            loc_dir,
+            False,
+            stats_hooks=[self.reports.append],
+        )
+
+    def tearDown(self):
+        self.migrator.close()
+        shutil.rmtree(self.root)
+
+    def test_run(self):
+        with redirect_stdout(io.StringIO()):
+            self.migrator.run(MockMigrationModule())
+        log = git(self.localization_dir, "log", "--pretty=format:%an:%s")
+        self.assertEqual(
+            log.splitlines(),
+            [
+                "Joe:No bug - test conversions, part 2.",
+                "Jane:No bug - test conversions, part 1.",
+                "Joe:Add two",
+                "Jane:Add one",
+            ],
+        )
+        with open(join(self.localization_dir, "d1", "f1.ftl")) as f:
+            self.assertEqual(f.read(), "one = ONE\ntwo = TWO\n")
+
+        self.assertEqual(len(self.reports), 1)
+        report = self.reports[0]
+        self.assertEqual(report["migration"], "tests.migrate.some")
+        self.assertEqual(report["locale"], "de")
+        self.assertEqual(
+            set(report["phases"]),
+            {"recipe", "read", "blame", "merge", "serialize", "write", "commit"},
+        )
+        self.assertEqual(
+            report["counters"],
+            {
+                "files_read": 2,
+                "changesets": 2,
+                "messages_evaluated": 2,
+                "bytes_written": 30,
+                "commits": 2,
+            },
+        )
+
+    def test_blame_file(self):
+        blame_file = join(self.root, "blame.json")
+        with open(blame_file, "w") as f:
+            json.dump(
+                {
+                    "de": {
+                        "authors": [
+                            "Other <other@example.com>",
+                            "Ann <ann@example.com>",
+                            "Bob <bob@example.com>",
+                        ],
+                        "blame": {
+                            "d1/f1.dtd": {
+                                "one": [2, 1000],
+                                "two": [1, 2000],
+                                "unused": [0, 10],
+                            },
+                            "d2/f2.dtd": {"one": [0, 10]},
+                        },
+                    }
+                },
+                f,
+            )
+        self.assertIsNone(read_blame_file(blame_file, "fr"))
+        self.migrator.blame = read_blame_file(blame_file, "de")
+        with redirect_stdout(io.StringIO()):
+            self.migrator.run(MockMigrationModule())
+        log = git(self.localization_dir, "log", "--pretty=format:%an:%s")
+        self.assertEqual(
+            log.splitlines()[:2],
+            [
+                "Ann:No bug - test conversions, part 2.",
+                "Bob:No bug - test conversions, part 1.",
+            ],
+        )
+
+    def test_localization_revision(self):
+        # The second entity isn't in the first commit.
+        self.migrator.localization_revision = "HEAD~1"
+        with redirect_stdout(io.StringIO()):
+            self.migrator.run(MockMigrationModule())
+        log = git(self.localization_dir, "log", "--pretty=format:%an:%s")
+        self.assertEqual(log.splitlines()[0], "Jane:No bug - test conversions, part 1.")
+        with open(join(self.localization_dir, "d1", "f1.ftl")) as f:
+            self.assertEqual(f.read(), "one = ONE\n")
+
+    def test_localization_revision_blame(self):
+        # Lines inserted later above the entities don't change their authors.
+        with open(join(self.localization_dir, "d1", "f1.dtd")) as f:
+            content = f.read()
+        with open(join(self.localization_dir, "d1", "f1.dtd"), "w") as f:
+            f.write("<!-- Bob -->\n<!-- Bob -->\n" + content)
+        git(
+            self.localization_dir,
+            "commit",
+            "--all",
+            "--author=Bob <bob@example.com>",
+            "--message=Add comments",
+        )
+        self.migrator.localization_revision = "HEAD~1"
+        with redirect_stdout(io.StringIO()):
+            self.migrator.run(MockMigrationModule())
+        log = git(self.localization_dir, "log", "--pretty=format:%an:%s")
+        self.assertEqual(
+            log.splitlines()[:2],
+            [
+                "Joe:No bug - test conversions, part 2.",
+                "Jane:No bug - test conversions, part 1.",
+            ],
+        )
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.archive = join(self.root, "de.zip")
+        with zipfile.ZipFile(self.archive, "w") as archive:
+            archive.writestr("d1/f1.dtd", '<!ENTITY one "ONE">\n')
+        self.blame_file = join(self.root, "blame.json")
+        with open(self.blame_file, "w") as f:
+            json.dump(
+                {
+                    "fr": {
+                        "authors": ["Jane <jane@example.com>"],
+                        "blame": {"d1/f1.dtd": {"one": [0, 1000]}},
+                    }
+                },
+                f,
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_cli_requires_blame_file(self):
+        argv = ["migrate-l10n", "--locale", "de", "--localization-dir", self.archive]
+        for args in (["--dry-run"], ["--blame-file", self.blame_file]):
+            with mock.patch.object(sys, "argv", argv + args + ["some"]):
+                with redirect_stderr(io.StringIO()) as stderr:
+                    with self.assertRaises(SystemExit):
+                        cli()
+            self.assertIn("--dry-run and --blame-file", stderr.getvalue())
+
+    def test_missing_locale(self):
+        with self.assertRaises(SystemExit):
+            main("de", self.root, self.archive, [], True, blame_file=self.blame_file)
+
+    def test_dry_run(self):
+        os.makedirs(join(self.root, "d1"))
+        with open(join(self.root, "d1", "f1.ftl"), "w") as f:
+            f.write("one = First\ntwo = Second\n")
+        with redirect_stdout(io.StringIO()) as stdout:
+            main(
+                "fr",
+                self.root,
+                self.archive,
+                [MockMigrationModule()],
+                True,
+                blame_file=self.blame_file,
+            )
+        self.assertIn(f"Writing to {self.archive}:d1/f1.ftl", stdout.getvalue())
+
+    def test_stats_file(self):
+        # Without --stats, the stats file is written as JSON.
+        os.makedirs(join(self.root, "d1"))
+        with open(join(self.root, "d1", "f1.ftl"), "w") as f:
+            f.write("one = First\n")
+        stats_file = join(self.root, "stats.json")
+        with redirect_stdout(io.StringIO()):
+            main(
+                "fr",
+                self.root,
+                self.archive,
+                [MockMigrationModule()],
+                True,
+                stats_file=stats_file,
+                blame_file=self.blame_file,
+            )
+        with open(stats_file) as f:
+            reports = json.load(f)
+        self.assertEqual(
+            [report["migration"] for report in reports], ["tests.migrate.some"]
+        )
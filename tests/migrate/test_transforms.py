@@ -1,10 +1,16 @@
+import copy
+import pickle
 import unittest
 
 from fluent.migrate.transforms import (
     chain_elements,
+    instance_dict,
+    CONCAT,
+    COPY,
+    TransformPattern,
     Transform,
 )
-from fluent.migrate.util import ftl_pattern_to_json
+from fluent.migrate.util import fold, ftl_pattern_to_json
 from fluent.syntax import ast as FTL
 
 
@@ -134,3 +140,48 @@ class TestPatternOf(unittest.TestCase):
             FTL.TextElement("\n  foo\nbar"),
         )
         self.assertEqual(pattern.to_json(), ftl_pattern_to_json('{""}\n    foo\n  bar'))
+
+
+class TestSlots(unittest.TestCase):
+    def test_vars(self):
+        node = CONCAT(COPY("file.dtd", "key"), FTL.TextElement("text"))
+        self.assertEqual(list(vars(node)), ["elements"])
+        self.assertEqual(
+            vars(node.elements[0]),
+            {
+                "path": "file.dtd",
+                "key": "key",
+                "trim": False,
+            },
+        )
+        self.assertEqual(
+            fold(lambda acc, cur: acc + [type(cur).__name__], node, []),
+            ["str", "str", "bool", "COPY", "NoneType", "str", "TextElement", "list"],
+        )
+        # The fields are kept in slots only.
+        self.assertEqual(instance_dict.__get__(node.elements[0]), {})
+
+    def test_copies(self):
+        node = CONCAT(COPY("file.dtd", "key"), FTL.TextElement("text"))
+        for other in (
+            node.clone(),
+            copy.deepcopy(node),
+            pickle.loads(pickle.dumps(node)),
+        ):
+            self.assertIsNot(other.elements[0], node.elements[0])
+            self.assertTrue(other.equals(node))
+
+    def test_subclass_without_slots(self):
+        class UPPER(TransformPattern):
+            def __init__(self, path, key, suffix=""):
+                super().__init__(path, key)
+                self.suffix = suffix
+
+        node = UPPER("file.ftl", "key", suffix="!")
+        self.assertEqual(vars(node), {"path": "file.ftl", "key": "key", "suffix": "!"})
+        self.assertEqual(node.clone().suffix, "!")
+        self.assertEqual(copy.deepcopy(node).suffix, "!")
+
+    def test_interned_paths(self):
+        path = "".join(["file", ".dtd"])
+        self.assertIs(COPY(path, "one").path, COPY("file.dtd", "two").path)
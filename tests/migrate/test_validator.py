@@ -1,4 +1,7 @@
 import ast
+import os
+import shutil
+import tempfile
 import unittest
 
 from unittest import mock
@@ -79,11 +82,97 @@ class TestValidator_inspect_migrate(unittest.TestCase):
 
     def test_ctx_var(self, Analyzer):
         Analyzer.return_value.references = []
+        Analyzer.return_value.dependencies = []
         Analyzer.return_value.issues = []
         v = validator.Validator("def migrate(ctx):\n pass", "bug_1.py")
         rv = v.inspect_migrate(v.ast.body[0], {})
         Analyzer.return_value.visit.assert_called_with(v.ast.body[0])
-        self.assertDictEqual(rv, {"issues": [], "references": []})
+        self.assertDictEqual(
+            rv, {"issues": [], "references": [], "dependencies": []}
+        )
+
+
+class TestValidator_dependencies(unittest.TestCase):
+    def dependencies(self, code):
+        return validator.Validator.validate("bug_1.py", code)["dependencies"]
+
+    def test_sources(self):
+        self.assertEqual(
+            self.dependencies(
+                """\
+from fluent.migrate import COPY, CONCAT, PLURALS
+from fluent.migrate.helpers import transforms_from
+import fluent.syntax.ast as FTL
+
+dtd = "browser/foo.dtd"
+key = "plural"
+
+def migrate(ctx):
+    ctx.add_transforms(
+        "browser/foo.ftl",
+        "browser/foo.ftl",
+        [
+            FTL.Message(
+                id=FTL.Identifier("one"),
+                value=CONCAT(COPY(dtd, "one"), COPY("browser/foo.properties", "x")),
+            ),
+            FTL.Message(
+                id=FTL.Identifier("plural"),
+                value=PLURALS("browser/foo.properties", key, None),
+            ),
+        ]
+        + transforms_from(
+            \"""
+two = { COPY(file, "two") }
+three = { COPY_PATTERN("browser/old.ftl", "three") }
+\""",
+            file=dtd,
+        ),
+    )
+    ctx.add_transforms("browser/bar.ftl", "browser/bar.ftl", [])
+"""
+            ),
+            [
+                {
+                    "target": "browser/foo.ftl",
+                    "reference": "browser/foo.ftl",
+                    "sources": {
+                        "browser/foo.dtd": ["one", "two"],
+                        "browser/foo.properties": ["plural", "x"],
+                        "browser/old.ftl": ["three"],
+                    },
+                    "complete": True,
+                },
+                {
+                    "target": "browser/bar.ftl",
+                    "reference": "browser/bar.ftl",
+                    "sources": {},
+                    "complete": True,
+                },
+            ],
+        )
+
+    def test_runtime(self):
+        dependencies = self.dependencies(
+            """\
+from fluent.migrate import COPY
+from fluent.migrate.helpers import transforms_from
+
+def migrate(ctx):
+    ctx.add_transforms(
+        "foo.ftl",
+        "foo.ftl",
+        [COPY(get_path(), "one")]
+        + transforms_from("two = { COPY(file, \\"two\\") }", file=get_path()),
+    )
+    transforms = [COPY("foo.dtd", "three")]
+    ctx.add_transforms("bar.ftl", "bar.ftl", transforms)
+"""
+        )
+        self.assertEqual(
+            [(dep["sources"], dep["complete"]) for dep in dependencies],
+            [({}, False), ({}, False)],
+        )
 
 
 class TestFullName(unittest.TestCase):
@@ -523,3 +612,109 @@ class TestTransformsInspector(unittest.TestCase):
         self.assertListEqual(
             ti.issues, ['Source "./foo/bar.ftl" needs to be a normalized path']
         )
+
+
+class TestValidateRecipes(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = os.path.join(self.root, "cache.json")
+        self.good = self.write(
+            "bug_1_good.py",
+            """\
+def migrate(ctx):
+    ctx.add_transforms("some/fluent.ftl", "some/fluent.ftl", [])
+""",
+        )
+        self.bad = self.write("bug_2_bad.py", "foo = 1\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, code):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as fh:
+            fh.write(code)
+        return path
+
+    def test_parallel(self):
+        results = validator.validate_recipes([self.good, self.bad], jobs=2)
+        self.assertEqual(list(results), [self.good, self.bad])
+        self.assertEqual(results[self.good]["references"], ["some/fluent.ftl"])
+        self.assertEqual(results[self.good]["issues"], [])
+        self.assertEqual(
+            results[self.bad],
+            {
+                "references": [],
+                "dependencies": [],
+                "issues": [{"msg": "migrate function not found", "line": 0}],
+            },
+        )
+
+    def test_unknown_transform(self):
+        path = self.write(
+            "bug_3.py",
+            """\
+from fluent.migrate.transforms import BOGUS
+
+def migrate(ctx):
+    ctx.add_transforms("some/fluent.ftl", "some/fluent.ftl", [
+        BOGUS("some.dtd", "key"),
+    ])
+""",
+        )
+        for jobs in (1, 2):
+            results = validator.validate_recipes([path, self.good], jobs=jobs)
+            self.assertEqual(list(results), [path, self.good])
+            self.assertEqual(
+                results[path]["issues"],
+                [
+                    {
+                        "msg": "AttributeError: module 'fluent.migrate.transforms' "
+                        "has no attribute 'BOGUS'",
+                        "line": 0,
+                    }
+                ],
+            )
+            self.assertNotIn("error", results[path])
+            self.assertEqual(results[self.good]["issues"], [])
+
+        # The failure isn't cached.
+        validator.validate_recipes([path, self.good], self.cache)
+        with mock.patch.object(
+            validator, "validate_recipe", wraps=validator.validate_recipe
+        ) as validate:
+            validator.validate_recipes([path, self.good], self.cache)
+            validate.assert_called_once()
+
+    def test_syntax_error(self):
+        path = self.write("bug_3.py", "def migrate(ctx)\n")
+        results = validator.validate_recipes([path])
+        self.assertEqual(results[path]["issues"][0]["line"], 1)
+
+    def test_cache(self):
+        expected = validator.validate_recipes([self.good, self.bad], self.cache)
+        with mock.patch.object(
+            validator, "validate_recipe", wraps=validator.validate_recipe
+        ) as validate:
+            self.assertEqual(
+                validator.validate_recipes([self.good, self.bad], self.cache),
+                expected,
+            )
+            validate.assert_not_called()
+
+            self.write("bug_2_bad.py", "foo = 2\n")
+            validator.validate_recipes([self.good, self.bad], self.cache)
+            validate.assert_called_once_with(self.bad, "foo = 2\n")
+
+    def test_cache_version(self):
+        with mock.patch.object(validator, "migrate_version", return_value="1.0"):
+            validator.validate_recipes([self.good], self.cache)
+        with mock.patch.object(
+            validator, "validate_recipe", wraps=validator.validate_recipe
+        ) as validate:
+            with mock.patch.object(validator, "migrate_version", return_value="1.0"):
+                validator.validate_recipes([self.good], self.cache)
+            validate.assert_not_called()
+            with mock.patch.object(validator, "migrate_version", return_value="1.1"):
+                validator.validate_recipes([self.good], self.cache)
+            validate.assert_called_once()